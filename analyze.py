@@ -0,0 +1,177 @@
+"""
+Batch analysis of FEN/EPD positions, streamed to JSON lines.
+
+    python analyze.py positions.epd [-o results.jsonl] [--nodes N] [--movetime S]
+                      [--depth N] [--workers N]
+    cat positions.fen | python analyze.py - > results.jsonl
+
+Input lines are read lazily and at most a few positions per worker are in
+flight at once, so memory use does not grow with the size of the input.
+Results come out in input order, one JSON object per line:
+
+    {"line": 3, "fen": "...", "id": "WAC.001", "bestmove": "g3g6", "san": "Qg6",
+     "score": 312, "mate": null, "depth": 6, "nodes": 48211, "time_ms": 903,
+     "pv": ["g3g6", ...], "bm": ["Qg6"], "solved": true}
+
+score is in centipawns from the side to move's point of view; mate is the
+number of moves to mate (negative if the side to move is mated) when the
+search found one. bm/am operations in EPD input are checked and reported
+as "solved". Lines that do not parse produce {"line": n, "error": ...}.
+"""
+import argparse
+import json
+import os
+import shlex
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import Position, BLACK
+from search import Searcher, MATE_SCORE, MATE_BOUND, MAX_PLY
+from tablebase import Tablebases
+
+# per-process state, set up by _init_worker
+_worker_searcher = None
+
+
+def parse_epd(line):
+    """
+    (fen, operations) for a FEN or EPD line. EPD lines have four fields and
+    operations such as 'bm Nf3; id "test 1";'; the move counters then
+    default to '0 1'. operations maps opcode -> list of operand strings.
+    """
+    fields = line.split()
+    if len(fields) < 4:
+        raise ValueError("expected at least 4 fields")
+    if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+        return ' '.join(fields[:6]), _epd_operations(' '.join(fields[6:]))
+    return ' '.join(fields[:4]) + ' 0 1', _epd_operations(' '.join(fields[4:]))
+
+
+def _epd_operations(text):
+    ops = {}
+    for op in text.split(';'):
+        parts = shlex.split(op)
+        if parts:
+            ops[parts[0]] = parts[1:]
+    return ops
+
+
+def read_positions(f):
+    """Yield (line number, text) for every non-blank, non-comment line of f."""
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield number, line
+
+
+def _init_worker(tt_mb, tablebase_dir):
+    global _worker_searcher
+    tablebases = Tablebases(tablebase_dir) if tablebase_dir is not None else None
+    _worker_searcher = Searcher(tt_mb=tt_mb, tablebases=tablebases)
+
+
+def analyse(number, text, depth, nodes, movetime):
+    """Worker task: search one position and return its result dict."""
+    try:
+        fen, ops = parse_epd(text)
+        pos = Position.from_fen(fen)
+    except (ValueError, IndexError, KeyError) as e:
+        return {'line': number, 'error': f"bad position: {e}"}
+
+    result = {'line': number, 'fen': fen}
+    if 'id' in ops:
+        result['id'] = ops['id'][0]
+    searcher = _worker_searcher
+    start = time.perf_counter()
+    val, move, reached = searcher.search(pos, depth, soft_time=movetime, hard_time=movetime,
+                                         max_nodes=nodes)
+    elapsed = time.perf_counter() - start
+    if move is None:
+        # no legal move: checkmate (mated now, mate 0) or stalemate (a draw)
+        mated = pos.in_check(pos.side)
+        result.update(bestmove=None, san=None, score=None if mated else 0, mate=0 if mated else None,
+                      depth=0, nodes=searcher.nodes, time_ms=int(elapsed * 1000), pv=[])
+        return result
+
+    score = val if pos.side == BLACK else -val
+    mate = None
+    if abs(score) >= MATE_BOUND:
+        moves = (MATE_SCORE - abs(score) + 1) // 2
+        mate = moves if score > 0 else -moves
+    san = pos.move_to_san(move)
+    result.update(bestmove=pos.move_to_uci(move), san=san, score=score, mate=mate,
+                  depth=reached, nodes=searcher.nodes, time_ms=int(elapsed * 1000),
+                  pv=[pos.move_to_uci(mv) for mv in searcher.pv])
+    # test suites: bm lists the best moves, am moves to avoid
+    checks = []
+    for op in ('bm', 'am'):
+        if op in ops:
+            result[op] = ops[op]
+            played = move in {pos.parse_san(m) for m in ops[op]}
+            checks.append(played if op == 'bm' else not played)
+    if checks:
+        result['solved'] = all(checks)
+    return result
+
+
+def analyse_stream(lines, depth=MAX_PLY, nodes=None, movetime=None, workers=None,
+                   tt_mb=16, tablebase_dir=None):
+    """
+    Yield a result dict for every (line number, text) in lines, in order.
+    At most two tasks per worker are outstanding, so lines is consumed
+    only as fast as results are produced.
+    """
+    workers = workers or os.cpu_count() or 1
+    window = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(tt_mb, tablebase_dir)) as pool:
+        pending = deque()
+        for number, text in lines:
+            pending.append(pool.submit(analyse, number, text, depth, nodes, movetime))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# ---------- command line ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse FEN/EPD positions to JSON lines")
+    parser.add_argument('input', nargs='?', default='-', help="FEN/EPD file, or - for stdin")
+    parser.add_argument('-o', '--output', default='-', help="JSON lines file, or - for stdout")
+    parser.add_argument('--depth', type=int, default=None)
+    parser.add_argument('--nodes', type=int, default=None, help="node budget per position")
+    parser.add_argument('--movetime', type=float, default=None, help="seconds per position")
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument('--hash', type=int, default=16, help="table size per worker (MB)")
+    parser.add_argument('--tablebases', default=None, help="tablebase directory")
+    args = parser.parse_args(argv)
+    if args.depth is None and args.nodes is None and args.movetime is None:
+        args.depth = 4
+
+    infile = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    outfile = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    solved = total = 0
+    try:
+        results = analyse_stream(read_positions(infile), args.depth or MAX_PLY, args.nodes,
+                                 args.movetime, args.workers, args.hash, args.tablebases)
+        for result in results:
+            outfile.write(json.dumps(result) + '\n')
+            outfile.flush()
+            if 'solved' in result:
+                total += 1
+                solved += result['solved']
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+    if total:
+        print(f"solved {solved}/{total}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
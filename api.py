@@ -0,0 +1,128 @@
+"""
+Engine front end for the GUI and for tooling.
+
+Engine runs searches on its own background thread and hands results back
+as concurrent.futures.Future objects (or awaitables, for asyncio code).
+A running search can be stopped at any time: the searcher polls its stop
+flag every TIME_CHECK_INTERVAL nodes and returns the last completed
+iteration.
+
+    engine = Engine(tt_mb=16)
+    future = engine.search(pos, SearchLimits(depth=8, hard_time=2.0))
+    ...
+    engine.stop()
+    value, move, depth = future.result()
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from search import Searcher, MAX_PLY, allocate_time
+from parallel import ParallelSearcher
+from tablebase import Tablebases
+
+
+class SearchLimits:
+    """
+    Bounds for one search. Whichever limit is reached first ends it; limits
+    left as None do not apply.
+
+    depth: maximum iterative-deepening depth.
+    nodes: node budget.
+    soft_time: seconds after which no new iteration is started.
+    hard_time: seconds after which the running iteration is abandoned.
+    """
+    __slots__ = ('depth', 'nodes', 'soft_time', 'hard_time')
+
+    def __init__(self, depth=MAX_PLY, nodes=None, soft_time=None, hard_time=None):
+        self.depth = depth
+        self.nodes = nodes
+        self.soft_time = soft_time
+        self.hard_time = hard_time
+
+    @classmethod
+    def for_clock(cls, remaining, move_number, depth=MAX_PLY):
+        """Limits for one move out of `remaining` seconds on the clock."""
+        soft, hard = allocate_time(remaining, move_number)
+        return cls(depth=depth, soft_time=soft, hard_time=hard)
+
+
+class Engine:
+    """
+    Owns a Searcher (or a ParallelSearcher when workers > 1) and one search
+    thread. Searches are queued in submission order; stop() ends the
+    running one and cancels any still waiting. Endgame tablebases are
+    loaded from tablebase_dir when given.
+    """
+    def __init__(self, tt_mb=16, workers=1, profile=False, tablebase_dir=None):
+        if workers > 1:
+            self.searcher = ParallelSearcher(workers=workers, tt_mb=tt_mb,
+                                             tablebase_dir=tablebase_dir)
+        else:
+            tablebases = Tablebases(tablebase_dir) if tablebase_dir is not None else None
+            self.searcher = Searcher(tt_mb=tt_mb, profile=profile, tablebases=tablebases)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='engine')
+        self._lock = threading.Lock()
+        self._running = False
+        self._pending = []
+
+    def search(self, pos, limits=None, on_info=None):
+        """
+        Start searching a copy of pos. Returns a Future resolving to
+        (best_value, best_move, depth), as Searcher.search. on_info is
+        called on the engine thread after every completed iteration.
+        """
+        limits = limits or SearchLimits()
+        stopped = threading.Event()
+        future = self._executor.submit(self._run, pos.copy(), limits, on_info, stopped)
+        with self._lock:
+            self._pending = [p for p in self._pending if not p[0].done()]
+            self._pending.append((future, stopped))
+        return future
+
+    async def search_async(self, pos, limits=None, on_info=None):
+        """Awaitable search(); cancelling the awaiting task stops the search."""
+        future = self.search(pos, limits, on_info)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            self.stop()
+            raise
+
+    def stop(self):
+        """Stop the running search and cancel queued ones. Returns immediately."""
+        with self._lock:
+            for future, stopped in self._pending:
+                stopped.set()  # in case it is about to start
+                future.cancel()
+            self._pending = []
+            if self._running:
+                self.searcher.stop()
+
+    @property
+    def busy(self):
+        """True while a search is running."""
+        return self._running
+
+    def shutdown(self):
+        """Stop searching and release the thread (and worker processes)."""
+        self.stop()
+        self._executor.shutdown(wait=True)
+        if isinstance(self.searcher, ParallelSearcher):
+            self.searcher.shutdown()
+
+    def _run(self, pos, limits, on_info, stopped):
+        with self._lock:
+            if stopped.is_set():
+                return (None, None, 0)
+            self._running = True
+        try:
+            return self.searcher.search(pos, limits.depth, soft_time=limits.soft_time,
+                                        hard_time=limits.hard_time, on_info=on_info,
+                                        max_nodes=limits.nodes)
+        finally:
+            with self._lock:
+                self._running = False
+                # stop() only signals the searcher while _running, so nothing
+                # is left set to abort the next search
+                self.searcher.stop_event.clear()
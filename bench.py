@@ -0,0 +1,157 @@
+"""
+Headless move-generator and search benchmarks.
+
+    python bench.py perft [--fen FEN] [--depth N] [--divide]
+    python bench.py suite [--max-nodes N]
+    python bench.py bench [--depth N]
+
+`perft` counts leaf nodes of the legal move tree (with `--divide`, per root
+move). `suite` checks perft against published reference counts for the
+standard test positions. `bench` searches a fixed set of positions to a
+fixed depth with a fresh Searcher and reports nodes, NPS and time to depth,
+so numbers can be compared across versions. Scores are in centipawns from
+Black's point of view, like everywhere else in the engine.
+"""
+import argparse
+import sys
+import time
+
+from engine import Position, START_FEN
+from search import Searcher
+
+# (name, fen, [nodes at depth 1, 2, 3, ...]) from the Chess Programming Wiki
+PERFT_SUITE = [
+    ('startpos', START_FEN, [20, 400, 8902, 197281, 4865609]),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     [48, 2039, 97862, 4085603]),
+    ('position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     [14, 191, 2812, 43238, 674624]),
+    ('position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467, 422333]),
+    ('position5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     [44, 1486, 62379, 2103487]),
+    ('position6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     [46, 2079, 89890, 3894594]),
+]
+
+# fixed positions for the search benchmark: opening, middlegame, endgame
+BENCH_POSITIONS = [
+    START_FEN,
+    'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3',
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    '8/8/4k3/8/2K5/8/3Q4/8 w - - 0 1',
+]
+
+
+# ---------- perft ----------
+def perft(pos, depth):
+    """Number of leaf nodes of the legal move tree below pos at depth."""
+    if depth == 0:
+        return 1
+    side = pos.side
+    nodes = 0
+    for mv in pos.generate_moves(side):
+        undo = pos.make_move(mv)
+        if not pos.in_check(side):
+            nodes += 1 if depth == 1 else perft(pos, depth - 1)
+        pos.unmake_move(mv, undo)
+    return nodes
+
+
+def divide(pos, depth):
+    """perft split by root move: [(uci_move, nodes), ...]."""
+    result = []
+    for mv in pos.legal_moves(pos.side):
+        name = pos.move_to_uci(mv)
+        undo = pos.make_move(mv)
+        result.append((name, perft(pos, depth - 1)))
+        pos.unmake_move(mv, undo)
+    return result
+
+
+def run_perft(fen, depth, show_divide):
+    pos = Position.from_fen(fen)
+    start = time.perf_counter()
+    if show_divide:
+        total = 0
+        for name, nodes in sorted(divide(pos, depth)):
+            print(f"{name}: {nodes}")
+            total += nodes
+        print()
+    else:
+        total = perft(pos, depth)
+    elapsed = time.perf_counter() - start
+    print(f"Nodes searched: {total}")
+    print(f"Time (s): {elapsed:.3f}")
+    print(f"Nodes/second: {int(total / elapsed) if elapsed > 0 else 0}")
+    return total
+
+
+def run_suite(max_nodes):
+    """Run every reference count up to max_nodes; returns True if all match."""
+    ok = True
+    for name, fen, counts in PERFT_SUITE:
+        for depth, expected in enumerate(counts, start=1):
+            if expected > max_nodes:
+                break
+            start = time.perf_counter()
+            got = perft(Position.from_fen(fen), depth)
+            elapsed = time.perf_counter() - start
+            status = 'ok' if got == expected else 'FAIL'
+            ok = ok and got == expected
+            print(f"{name:<10} depth {depth}  {got:>9} / {expected:<9} {elapsed:7.2f}s  {status}")
+    return ok
+
+
+# ---------- search bench ----------
+def run_bench(depth):
+    total_nodes = 0
+    total_time = 0.0
+    for i, fen in enumerate(BENCH_POSITIONS, start=1):
+        pos = Position.from_fen(fen)
+        searcher = Searcher()
+        start = time.perf_counter()
+        val, move, reached = searcher.search(pos, depth)
+        elapsed = time.perf_counter() - start
+        total_nodes += searcher.nodes
+        total_time += elapsed
+        best = pos.move_to_uci(move) if move else '(none)'
+        print(f"position {i}: depth {reached} bestmove {best} score {val} "
+              f"nodes {searcher.nodes} time {elapsed * 1000:.0f} ms")
+    print()
+    print(f"Total time (ms) : {total_time * 1000:.0f}")
+    print(f"Nodes searched  : {total_nodes}")
+    print(f"Nodes/second    : {int(total_nodes / total_time) if total_time > 0 else 0}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chess engine perft and search benchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('perft', help="count move-tree leaf nodes")
+    p.add_argument('--fen', default=START_FEN)
+    p.add_argument('--depth', type=int, default=3)
+    p.add_argument('--divide', action='store_true', help="show counts per root move")
+
+    s = sub.add_parser('suite', help="check perft against reference counts")
+    s.add_argument('--max-nodes', type=int, default=100000,
+                   help="skip depths whose reference count exceeds this")
+
+    b = sub.add_parser('bench', help="fixed-depth search benchmark")
+    b.add_argument('--depth', type=int, default=4)
+
+    args = parser.parse_args(argv)
+    if args.command == 'perft':
+        run_perft(args.fen, args.depth, args.divide)
+    elif args.command == 'suite':
+        if not run_suite(args.max_nodes):
+            return 1
+    else:
+        run_bench(args.depth)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
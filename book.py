@@ -0,0 +1,234 @@
+"""
+Opening book: a sorted binary file of (key, move, weight) records, looked
+up by binary search over an mmap so opening it costs no load time and no
+resident memory beyond the pages actually touched.
+
+The record layout and move encoding are Polyglot's: 16 bytes, big-endian
+(key u64, move u16, weight u16, learn u32), sorted by key, with castling
+stored as king-takes-rook. Keys are this engine's Zobrist keys
+(Position.key), not Polyglot's hash, so books must be built with this
+module:
+
+    python book.py build games.pgn [more.pgn ...] -o book.bin [--max-ply N]
+    python book.py selfplay -o book.bin [--games N] [--nodes N] [--max-ply N]
+    python book.py probe [--fen FEN] [--book book.bin]
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+
+from engine import Position, START_FEN, BLACK, KING, row_col, square
+from pgn import read_games, game_moves
+from search import Searcher
+
+RECORD = struct.Struct('>QHHI')
+_KEY = struct.Struct('>Q')
+
+BOOK_PLY = 16  # default number of plies from each game that go into a book
+
+
+# ---------- move encoding ----------
+def encode_book_move(pos, move):
+    """Polyglot 16-bit encoding of a move in pos."""
+    frm, to, promo = move
+    fr, fc = row_col(frm)
+    tr, tc = row_col(to)
+    if pos.board[frm] & 7 == KING and abs(to - frm) == 2:
+        tc = 7 if to > frm else 0  # castling is stored as king takes rook
+    code = tc | (7 - tr) << 3 | fc << 6 | (7 - fr) << 9
+    if promo:
+        code |= (promo - 1) << 12  # knight 1, bishop 2, rook 3, queen 4
+    return code
+
+
+def decode_book_move(pos, code):
+    """The legal move in pos for a Polyglot move code, or None."""
+    frm = square(7 - (code >> 9 & 7), code >> 6 & 7)
+    to = square(7 - (code >> 3 & 7), code & 7)
+    promo = code >> 12 & 7
+    if pos.board[frm] & 7 == KING and frm // 10 == to // 10 and abs(to - frm) > 2:
+        to = frm + 2 if to > frm else frm - 2
+    move = (frm, to, promo + 1 if promo else 0)
+    return move if move in pos.legal_moves(pos.side) else None
+
+
+# ---------- reading ----------
+class OpeningBook:
+    """Read-only view of a book file."""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # an empty file cannot be mapped
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.count = size // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def _first_index(self, key):
+        """Index of the first record whose key is >= key."""
+        data = self._data
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _KEY.unpack_from(data, mid * RECORD.size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def entries(self, pos):
+        """[(move, weight), ...] for pos, highest weight first."""
+        result = []
+        i = self._first_index(pos.key)
+        while i < self.count:
+            key, code, weight, _ = RECORD.unpack_from(self._data, i * RECORD.size)
+            if key != pos.key:
+                break
+            move = decode_book_move(pos, code)
+            if move is not None:
+                result.append((move, weight))
+            i += 1
+        result.sort(key=lambda e: -e[1])
+        return result
+
+    def choose(self, pos, rng=random):
+        """A book move for pos picked at random by weight, or None."""
+        entries = [e for e in self.entries(pos) if e[1] > 0]
+        if not entries:
+            return None
+        moves, weights = zip(*entries)
+        return rng.choices(moves, weights)[0]
+
+
+# ---------- building ----------
+def build_book(games, path, max_ply=BOOK_PLY, min_games=1):
+    """
+    Write a book from games, an iterable of (start_position, moves, result)
+    with result '1-0', '0-1', '1/2-1/2' or '*'. Each move scores 2 for a
+    win of the side that played it, 1 for a draw or an unknown result and 0
+    for a loss; moves seen in fewer than min_games games are dropped.
+    Returns the number of records written.
+    """
+    stats = {}  # (key, code) -> [weight, games]
+    for start, moves, result in games:
+        pos = start.copy()
+        for mv in moves[:max_ply]:
+            if result == '1/2-1/2' or result == '*':
+                score = 1
+            else:
+                score = 2 if result == ('1-0', '0-1')[pos.side] else 0
+            entry = stats.setdefault((pos.key, encode_book_move(pos, mv)), [0, 0])
+            entry[0] += score
+            entry[1] += 1
+            pos.make_move(mv)
+
+    records = sorted(((key, code, min(weight, 0xFFFF))
+                      for (key, code), (weight, count) in stats.items() if count >= min_games),
+                     key=lambda r: (r[0], -r[2]))
+    with open(path, 'wb') as f:
+        for key, code, weight in records:
+            f.write(RECORD.pack(key, code, weight, 0))
+    return len(records)
+
+
+def pgn_games(paths):
+    """(start_position, moves, result) for every game in the PGN files."""
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for headers, sans in read_games(f):
+                start, moves = game_moves(headers, sans)
+                if moves:
+                    yield start, moves, headers.get('Result', '*')
+
+
+def self_play_games(count, nodes, max_ply=BOOK_PLY, margin=30, seed=None):
+    """
+    Opening lines played by the engine against itself. At each ply every
+    legal move is searched with a node budget and one is picked at random
+    from those within margin centipawns of the best, so the lines vary.
+    Results are unknown ('*'): weights end up counting how often the
+    engine chose each move.
+    """
+    rng = random.Random(seed)
+    searcher = Searcher(tt_mb=8)
+    for _ in range(count):
+        start = Position.start()
+        pos = start.copy()
+        moves = []
+        for _ in range(max_ply):
+            scored = []
+            for mv in pos.legal_moves(pos.side):
+                undo = pos.make_move(mv)
+                val, _, _ = searcher.search(pos, 64, max_nodes=nodes)
+                pos.unmake_move(mv, undo)
+                # values are from Black's side; flip them for White
+                scored.append((val if pos.side == BLACK else -val, mv))
+            if not scored:
+                break
+            best = max(s for s, _ in scored)
+            mv = rng.choice([m for s, m in scored if s >= best - margin])
+            moves.append(mv)
+            pos.make_move(mv)
+        yield start, moves, '*'
+
+
+# ---------- command line ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and probe opening books")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    b = sub.add_parser('build', help="build a book from PGN files")
+    b.add_argument('pgn', nargs='+')
+    b.add_argument('-o', '--output', default='book.bin')
+    b.add_argument('--max-ply', type=int, default=BOOK_PLY)
+    b.add_argument('--min-games', type=int, default=1, help="drop moves played in fewer games")
+
+    s = sub.add_parser('selfplay', help="build a book from engine self-play")
+    s.add_argument('-o', '--output', default='book.bin')
+    s.add_argument('--games', type=int, default=20)
+    s.add_argument('--nodes', type=int, default=2000, help="search budget per candidate move")
+    s.add_argument('--max-ply', type=int, default=10)
+    s.add_argument('--seed', type=int, default=None)
+
+    p = sub.add_parser('probe', help="list book moves for a position")
+    p.add_argument('--fen', default=START_FEN)
+    p.add_argument('--book', default='book.bin')
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        n = build_book(pgn_games(args.pgn), args.output, args.max_ply, args.min_games)
+        print(f"{n} entries written to {args.output}")
+    elif args.command == 'selfplay':
+        games = self_play_games(args.games, args.nodes, args.max_ply, seed=args.seed)
+        n = build_book(games, args.output, args.max_ply)
+        print(f"{n} entries written to {args.output}")
+    else:
+        pos = Position.from_fen(args.fen)
+        with OpeningBook(args.book) as book:
+            entries = book.entries(pos)
+            total = sum(w for _, w in entries) or 1
+            for mv, weight in entries:
+                print(f"{pos.move_to_san(mv):<8} weight {weight:>5}  {100 * weight / total:5.1f}%")
+            if not entries:
+                print("(no book moves)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
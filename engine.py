@@ -0,0 +1,782 @@
+"""
+Headless chess engine core: board representation, move generation and
+evaluation. Nothing in here imports tkinter, so it can be used by the GUI
+in main.py as well as from worker processes, benchmarks and scripts.
+
+The board is a 10x12 mailbox stored in a bytearray. Square index
+21 + row*10 + col maps to the GUI's (row, col), with row 0 at the top
+(Black's back rank). The two-square border on every side is filled with
+OFFBOARD so sliding pieces and knights stop without any bounds checks.
+"""
+
+import random
+
+import evaluation
+
+# ---------- piece encoding ----------
+# piece byte = type | (color << 3); white is color 0 (lowercase in the GUI),
+# black is color 1 (uppercase in the GUI).
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+WHITE, BLACK = 0, 1
+OFFBOARD = 0xFF
+
+_TYPE_CHARS = '.pnbrqk'
+
+# GUI character <-> piece byte (white = lowercase, black = uppercase)
+CHAR_TO_PIECE = {'.': EMPTY}
+PIECE_TO_CHAR = {EMPTY: '.'}
+for _t in range(PAWN, KING + 1):
+    CHAR_TO_PIECE[_TYPE_CHARS[_t]] = _t
+    CHAR_TO_PIECE[_TYPE_CHARS[_t].upper()] = _t | (BLACK << 3)
+    PIECE_TO_CHAR[_t] = _TYPE_CHARS[_t]
+    PIECE_TO_CHAR[_t | (BLACK << 3)] = _TYPE_CHARS[_t].upper()
+
+# ---------- squares ----------
+def square(r, c):
+    """Mailbox index for GUI coordinates (row, col)."""
+    return 21 + r * 10 + c
+
+
+def row_col(sq):
+    """GUI coordinates (row, col) for a mailbox index."""
+    return divmod(sq - 21, 10)
+
+
+def square_name(sq):
+    """Algebraic name of a mailbox square, e.g. 'e4'."""
+    r, c = row_col(sq)
+    return 'abcdefgh'[c] + str(8 - r)
+
+
+def parse_square(name):
+    """Mailbox index for an algebraic square name, e.g. 'e4'."""
+    return square(8 - int(name[1]), 'abcdefgh'.index(name[0]))
+
+
+# all 64 playable mailbox indices, in GUI row-major order
+SQUARES = tuple(square(r, c) for r in range(8) for c in range(8))
+
+# ---------- move offsets ----------
+KNIGHT_OFFSETS = (-21, -19, -12, -8, 8, 12, 19, 21)
+BISHOP_OFFSETS = (-11, -9, 9, 11)
+ROOK_OFFSETS = (-10, -1, 1, 10)
+KING_OFFSETS = BISHOP_OFFSETS + ROOK_OFFSETS
+
+SLIDER_OFFSETS = {BISHOP: BISHOP_OFFSETS, ROOK: ROOK_OFFSETS, QUEEN: KING_OFFSETS}
+STEPPER_OFFSETS = {KNIGHT: KNIGHT_OFFSETS, KING: KING_OFFSETS}
+
+
+def _targets(offsets):
+    """Per mailbox square, the on-board squares one offset away."""
+    table = [()] * 120
+    for sq in SQUARES:
+        table[sq] = tuple(sq + d for d in offsets if sq + d in _ON_BOARD)
+    return table
+
+
+def _rays(offsets):
+    """Per mailbox square, one tuple of squares per direction, nearest first, up to the edge."""
+    table = [()] * 120
+    for sq in SQUARES:
+        rays = []
+        for d in offsets:
+            ray = []
+            to = sq + d
+            while to in _ON_BOARD:
+                ray.append(to)
+                to += d
+            if ray:
+                rays.append(tuple(ray))
+        table[sq] = tuple(rays)
+    return table
+
+
+# target and ray tables, built once so move generation and attack tests
+# walk plain tuples instead of adding offsets and testing for OFFBOARD
+_ON_BOARD = frozenset(SQUARES)
+KNIGHT_TARGETS = _targets(KNIGHT_OFFSETS)
+KING_TARGETS = _targets(KING_OFFSETS)
+BISHOP_RAYS = _rays(BISHOP_OFFSETS)
+ROOK_RAYS = _rays(ROOK_OFFSETS)
+QUEEN_RAYS = _rays(KING_OFFSETS)
+SLIDER_RAYS = {BISHOP: BISHOP_RAYS, ROOK: ROOK_RAYS, QUEEN: QUEEN_RAYS}
+STEPPER_TARGETS = {KNIGHT: KNIGHT_TARGETS, KING: KING_TARGETS}
+
+# pawn forward step, starting row and promotion row per color
+PAWN_STEP = (-10, 10)
+PAWN_START_ROW = (6, 1)
+PROMOTION_ROW = (0, 7)
+PROMOTION_PIECES = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+
+def _pawn_tables(color):
+    """
+    Per mailbox square, for a pawn of color: its pushes (the double step
+    only from the starting row), its capture targets, and whether a move
+    from there promotes.
+    """
+    step = PAWN_STEP[color]
+    pushes = [()] * 120
+    captures = [()] * 120
+    promotes = [False] * 120
+    for sq in SQUARES:
+        if sq + step not in _ON_BOARD:
+            continue
+        row = (sq - 21) // 10
+        pushes[sq] = (sq + step, sq + 2 * step) if row == PAWN_START_ROW[color] else (sq + step,)
+        captures[sq] = tuple(to for to in (sq + step - 1, sq + step + 1) if to in _ON_BOARD)
+        promotes[sq] = row + (1 if step > 0 else -1) == PROMOTION_ROW[color]
+    return pushes, captures, promotes
+
+
+# indexed [color][sq]; a pawn of by_color attacks sq from PAWN_CAPTURES[by_color ^ 1][sq]
+PAWN_PUSHES, PAWN_CAPTURES, PAWN_PROMOTES = zip(_pawn_tables(WHITE), _pawn_tables(BLACK))
+
+# ---------- castling ----------
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+ALL_CASTLING = 15
+
+# king start square and rook squares per color
+KING_HOME = (square(7, 4), square(0, 4))
+KINGSIDE_ROOK = (square(7, 7), square(0, 7))
+QUEENSIDE_ROOK = (square(7, 0), square(0, 0))
+KINGSIDE_RIGHT = (WHITE_KINGSIDE, BLACK_KINGSIDE)
+QUEENSIDE_RIGHT = (WHITE_QUEENSIDE, BLACK_QUEENSIDE)
+
+# castling rights that survive a move from or to each square
+CASTLE_MASK = [ALL_CASTLING] * 120
+CASTLE_MASK[KING_HOME[WHITE]] &= ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLE_MASK[KING_HOME[BLACK]] &= ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLE_MASK[KINGSIDE_ROOK[WHITE]] &= ~WHITE_KINGSIDE
+CASTLE_MASK[QUEENSIDE_ROOK[WHITE]] &= ~WHITE_QUEENSIDE
+CASTLE_MASK[KINGSIDE_ROOK[BLACK]] &= ~BLACK_KINGSIDE
+CASTLE_MASK[QUEENSIDE_ROOK[BLACK]] &= ~BLACK_QUEENSIDE
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# ---------- zobrist keys ----------
+# Fixed seed so keys (and anything persisted with them) are stable across runs.
+_zobrist_rng = random.Random(0x5EED)
+ZOBRIST_PIECE = [[_zobrist_rng.getrandbits(64) if p in PIECE_TO_CHAR and p != EMPTY else 0
+                  for _sq in range(120)] for p in range(16)]
+ZOBRIST_SIDE = _zobrist_rng.getrandbits(64)
+ZOBRIST_CASTLING = [_zobrist_rng.getrandbits(64) for _ in range(16)]
+ZOBRIST_EP = [_zobrist_rng.getrandbits(64) for _ in range(120)]
+
+# ---------- evaluation tables ----------
+# EVAL_MG[piece][sq] / EVAL_EG[piece][sq]: material plus piece-square bonus
+# for that piece on that mailbox square, signed from Black's perspective.
+EVAL_MG = [[0] * 120 for _ in range(16)]
+EVAL_EG = [[0] * 120 for _ in range(16)]
+PHASE = [0] * 16
+
+
+def eval_tables(params=None):
+    """
+    (mg, eg) mailbox lookups, shaped like EVAL_MG/EVAL_EG, for evaluation
+    parameters (mg_values, eg_values, pst_mg, pst_eg) as in evaluation.py;
+    the ones in use there by default.
+    """
+    mg_values, eg_values, pst_mg, pst_eg = params or evaluation.current_params()
+    mg = [[0] * 120 for _ in range(16)]
+    eg = [[0] * 120 for _ in range(16)]
+    for kind in range(PAWN, KING + 1):
+        for color in (WHITE, BLACK):
+            piece = kind | (color << 3)
+            sign = 1 if color == BLACK else -1
+            for i, sq in enumerate(SQUARES):
+                # tables are written for White; Black reads them mirrored
+                idx = i if color == WHITE else i ^ 56
+                mg[piece][sq] = sign * (mg_values[kind] + pst_mg[kind][idx])
+                eg[piece][sq] = sign * (eg_values[kind] + pst_eg[kind][idx])
+    return mg, eg
+
+
+def set_eval_tables(tables):
+    """
+    Make (mg, eg) from eval_tables() the ones every Position uses. Positions
+    keep running totals, so refresh() any that already exist.
+    """
+    EVAL_MG[:], EVAL_EG[:] = tables
+
+
+def build_eval_tables():
+    """(Re)build the mailbox lookups from the parameters in evaluation.py."""
+    for kind in range(PAWN, KING + 1):
+        PHASE[kind] = PHASE[kind | (BLACK << 3)] = evaluation.PHASE_WEIGHTS[kind]
+    set_eval_tables(eval_tables())
+
+
+build_eval_tables()
+
+
+class Position:
+    """
+    A chess position: the mailbox board, the side to move, castling rights,
+    the en-passant square, the move clocks, its Zobrist key, both king
+    squares, the number of pieces on the board and the running evaluation
+    terms (middlegame and endgame scores, game phase). make_move/unmake_move
+    keep all of these up to date incrementally.
+
+    Moves are (from_sq, to_sq, promotion) tuples of mailbox indices, with
+    promotion 0 or the piece type a pawn promotes to. Castling is a king
+    move of two squares and en passant is a pawn capture onto self.ep.
+    """
+    __slots__ = ('board', 'side', 'castling', 'ep', 'halfmove', 'fullmove',
+                 'key', 'kings', 'piece_count', 'mg', 'eg', 'phase')
+
+    def __init__(self, board=None, side=WHITE, castling=0, ep=0, halfmove=0, fullmove=1):
+        if board is None:
+            board = bytearray([OFFBOARD]) * 120
+            for sq in SQUARES:
+                board[sq] = EMPTY
+        self.board = board
+        self.side = side
+        self.castling = castling
+        self.ep = ep
+        self.halfmove = halfmove
+        self.fullmove = fullmove
+        self.refresh()
+
+    def refresh(self):
+        """Recompute key, king squares, piece count and evaluation terms from the board."""
+        self.key = self.compute_key()
+        self.kings = [self.find_king(WHITE), self.find_king(BLACK)]
+        self.piece_count = sum(1 for sq in SQUARES if self.board[sq] != EMPTY)
+        self.mg, self.eg, self.phase = self.compute_eval()
+
+    # ---------- construction / conversion ----------
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        Build a position from FEN. FEN writes White in uppercase; the GUI
+        convention here is the reverse, so characters are swapped on the way in.
+        """
+        fields = fen.split()
+        placement = fields[0]
+        side = BLACK if len(fields) > 1 and fields[1] == 'b' else WHITE
+        rights = fields[2] if len(fields) > 2 else '-'
+        ep_field = fields[3] if len(fields) > 3 else '-'
+
+        pos = cls(side=side)
+        board = pos.board
+        for r, rank in enumerate(placement.split('/')):
+            c = 0
+            for ch in rank:
+                if ch.isdigit():
+                    c += int(ch)
+                else:
+                    board[21 + r * 10 + c] = CHAR_TO_PIECE[ch.swapcase()]
+                    c += 1
+        castling = 0
+        for ch, bit in (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE),
+                        ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE)):
+            if ch in rights:
+                castling |= bit
+        pos.castling = castling
+        pos.ep = parse_square(ep_field) if ep_field != '-' else 0
+        pos.halfmove = int(fields[4]) if len(fields) > 4 else 0
+        pos.fullmove = int(fields[5]) if len(fields) > 5 else 1
+        pos.refresh()
+        return pos
+
+    @classmethod
+    def start(cls):
+        return cls.from_fen(START_FEN)
+
+    def to_fen(self):
+        board = self.board
+        ranks = []
+        for r in range(8):
+            rank = ''
+            empty = 0
+            for c in range(8):
+                piece = board[21 + r * 10 + c]
+                if piece == EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += PIECE_TO_CHAR[piece].swapcase()
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        rights = ''.join(ch for ch, bit in (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE),
+                                            ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE))
+                         if self.castling & bit) or '-'
+        ep = square_name(self.ep) if self.ep else '-'
+        return f"{'/'.join(ranks)} {'wb'[self.side]} {rights} {ep} {self.halfmove} {self.fullmove}"
+
+    def copy(self):
+        return Position(self.board[:], self.side, self.castling, self.ep, self.halfmove, self.fullmove)
+
+    def compute_key(self):
+        """Zobrist key from scratch (make_move updates it incrementally)."""
+        board = self.board
+        key = ZOBRIST_SIDE if self.side == BLACK else 0
+        key ^= ZOBRIST_CASTLING[self.castling]
+        if self.ep:
+            key ^= ZOBRIST_EP[self.ep]
+        for sq in SQUARES:
+            piece = board[sq]
+            if piece != EMPTY:
+                key ^= ZOBRIST_PIECE[piece][sq]
+        return key
+
+    def piece_char(self, r, c):
+        return PIECE_TO_CHAR[self.board[21 + r * 10 + c]]
+
+    # ---------- move generation ----------
+    def piece_moves(self, sq):
+        """Pseudo-legal moves for the piece on sq as [(from_sq, to_sq, promotion), ...]."""
+        board = self.board
+        piece = board[sq]
+        moves = []
+        if piece == EMPTY or piece == OFFBOARD:
+            return moves
+
+        color = piece >> 3
+        kind = piece & 7
+
+        if kind == PAWN:
+            promotes = PAWN_PROMOTES[color][sq]
+            for to in PAWN_PUSHES[color][sq]:
+                if board[to] != EMPTY:
+                    break  # blocked: no single push, and no double step through it
+                if promotes:
+                    for promo in PROMOTION_PIECES:
+                        moves.append((sq, to, promo))
+                else:
+                    moves.append((sq, to, 0))
+            for to in PAWN_CAPTURES[color][sq]:
+                target = board[to]
+                if target != EMPTY and (target >> 3) != color:
+                    if promotes:
+                        for promo in PROMOTION_PIECES:
+                            moves.append((sq, to, promo))
+                    else:
+                        moves.append((sq, to, 0))
+                elif to == self.ep and self.ep and color == self.side:
+                    moves.append((sq, to, 0))
+
+        elif kind == KNIGHT or kind == KING:
+            for to in STEPPER_TARGETS[kind][sq]:
+                target = board[to]
+                if target == EMPTY or (target >> 3) != color:
+                    moves.append((sq, to, 0))
+            if kind == KING and self.castling and sq == KING_HOME[color]:
+                self._castling_moves(sq, color, moves)
+
+        else:
+            for ray in SLIDER_RAYS[kind][sq]:
+                for to in ray:
+                    target = board[to]
+                    if target == EMPTY:
+                        moves.append((sq, to, 0))
+                        continue
+                    if (target >> 3) != color:
+                        moves.append((sq, to, 0))
+                    break
+
+        return moves
+
+    def _castling_moves(self, sq, color, moves):
+        """
+        Append castling moves for the king on its home square. The king may
+        not be in check or pass through an attacked square; the landing
+        square is checked by the usual legality test.
+        """
+        board = self.board
+        enemy = color ^ 1
+        if (self.castling & KINGSIDE_RIGHT[color] and board[sq + 1] == EMPTY
+                and board[sq + 2] == EMPTY
+                and not self.is_square_attacked(sq, enemy)
+                and not self.is_square_attacked(sq + 1, enemy)):
+            moves.append((sq, sq + 2, 0))
+        if (self.castling & QUEENSIDE_RIGHT[color] and board[sq - 1] == EMPTY
+                and board[sq - 2] == EMPTY and board[sq - 3] == EMPTY
+                and not self.is_square_attacked(sq, enemy)
+                and not self.is_square_attacked(sq - 1, enemy)):
+            moves.append((sq, sq - 2, 0))
+
+    def generate_moves(self, color):
+        """All pseudo-legal moves for color as [(from_sq, to_sq, promotion), ...]."""
+        board = self.board
+        piece_moves = self.piece_moves
+        moves = []
+        for sq in SQUARES:
+            piece = board[sq]
+            if piece != EMPTY and (piece >> 3) == color:
+                moves.extend(piece_moves(sq))
+        return moves
+
+    def generate_captures(self, color):
+        """
+        Pseudo-legal captures and promotions for color, for quiescence
+        search. Generated directly, so no quiet moves are built and dropped.
+        """
+        board = self.board
+        piece_moves = self.piece_moves
+        moves = []
+        for sq in SQUARES:
+            piece = board[sq]
+            if piece == EMPTY or (piece >> 3) != color:
+                continue
+            kind = piece & 7
+            if kind == PAWN:
+                # few moves, and promotions and en passant need the full rules
+                for mv in piece_moves(sq):
+                    if board[mv[1]] != EMPTY or mv[2]:
+                        moves.append(mv)
+            elif kind == KNIGHT or kind == KING:
+                for to in STEPPER_TARGETS[kind][sq]:
+                    target = board[to]
+                    if target != EMPTY and (target >> 3) != color:
+                        moves.append((sq, to, 0))
+            else:
+                for ray in SLIDER_RAYS[kind][sq]:
+                    for to in ray:
+                        target = board[to]
+                        if target != EMPTY:
+                            if (target >> 3) != color:
+                                moves.append((sq, to, 0))
+                            break
+        return moves
+
+    def make_move(self, move):
+        """
+        Apply move=(from_sq, to_sq, promotion) in place and return the undo
+        record (captured piece, moved piece, previous key, evaluation terms,
+        castling rights, en-passant square, move clocks and piece count)
+        needed by unmake_move.
+        """
+        frm, to, promo = move
+        board = self.board
+        moved = board[frm]
+        captured = board[to]
+        color = moved >> 3
+        kind = moved & 7
+        key = self.key
+        undo = (captured, moved, key, self.mg, self.eg, self.phase,
+                self.castling, self.ep, self.halfmove, self.fullmove, self.piece_count)
+
+        key ^= ZOBRIST_SIDE ^ ZOBRIST_PIECE[moved][frm]
+        self.mg -= EVAL_MG[moved][frm]
+        self.eg -= EVAL_EG[moved][frm]
+        if captured != EMPTY:
+            key ^= ZOBRIST_PIECE[captured][to]
+            self.mg -= EVAL_MG[captured][to]
+            self.eg -= EVAL_EG[captured][to]
+            self.phase -= PHASE[captured]
+            self.piece_count -= 1
+
+        placed = moved
+        ep = self.ep
+        new_ep = 0
+        if kind == PAWN:
+            if to == ep and ep:
+                # en passant: the captured pawn sits behind the target square
+                cap_sq = to - PAWN_STEP[color]
+                victim = board[cap_sq]
+                key ^= ZOBRIST_PIECE[victim][cap_sq]
+                self.mg -= EVAL_MG[victim][cap_sq]
+                self.eg -= EVAL_EG[victim][cap_sq]
+                board[cap_sq] = EMPTY
+                self.piece_count -= 1
+            elif to - frm == 2 * PAWN_STEP[color]:
+                new_ep = frm + PAWN_STEP[color]
+            elif promo:
+                placed = promo | (color << 3)
+                self.phase += PHASE[placed]
+        elif kind == KING:
+            self.kings[color] = to
+            if to - frm == 2 or frm - to == 2:
+                # castling: bring the rook across the king
+                if to > frm:
+                    rook_from, rook_to = frm + 3, frm + 1
+                else:
+                    rook_from, rook_to = frm - 4, frm - 1
+                rook = board[rook_from]
+                key ^= ZOBRIST_PIECE[rook][rook_from] ^ ZOBRIST_PIECE[rook][rook_to]
+                self.mg += EVAL_MG[rook][rook_to] - EVAL_MG[rook][rook_from]
+                self.eg += EVAL_EG[rook][rook_to] - EVAL_EG[rook][rook_from]
+                board[rook_to] = rook
+                board[rook_from] = EMPTY
+
+        key ^= ZOBRIST_PIECE[placed][to]
+        self.mg += EVAL_MG[placed][to]
+        self.eg += EVAL_EG[placed][to]
+        board[to] = placed
+        board[frm] = EMPTY
+
+        if ep:
+            key ^= ZOBRIST_EP[ep]
+        if new_ep:
+            key ^= ZOBRIST_EP[new_ep]
+        self.ep = new_ep
+        castling = self.castling
+        if castling:
+            new_castling = castling & CASTLE_MASK[frm] & CASTLE_MASK[to]
+            if new_castling != castling:
+                key ^= ZOBRIST_CASTLING[castling] ^ ZOBRIST_CASTLING[new_castling]
+                self.castling = new_castling
+
+        self.halfmove = 0 if kind == PAWN or captured != EMPTY else self.halfmove + 1
+        if color == BLACK:
+            self.fullmove += 1
+        self.side ^= 1
+        self.key = key
+        return undo
+
+    def unmake_move(self, move, undo):
+        """Take back a move made with make_move."""
+        frm, to, promo = move
+        (captured, moved, self.key, self.mg, self.eg, self.phase,
+         self.castling, self.ep, self.halfmove, self.fullmove, self.piece_count) = undo
+        board = self.board
+        board[frm] = moved
+        board[to] = captured
+        kind = moved & 7
+        if kind == PAWN:
+            if to == self.ep and self.ep:
+                color = moved >> 3
+                board[to - PAWN_STEP[color]] = PAWN | ((color ^ 1) << 3)
+        elif kind == KING:
+            self.kings[moved >> 3] = frm
+            if to - frm == 2:
+                board[frm + 3] = board[frm + 1]
+                board[frm + 1] = EMPTY
+            elif frm - to == 2:
+                board[frm - 4] = board[frm - 1]
+                board[frm - 1] = EMPTY
+        self.side ^= 1
+
+    # ---------- check detection ----------
+    def find_king(self, color):
+        board = self.board
+        king = KING | (color << 3)
+        for sq in SQUARES:
+            if board[sq] == king:
+                return sq
+        return None
+
+    def is_square_attacked(self, sq, by_color):
+        """
+        True if any piece of by_color attacks sq. Works outward from sq:
+        the pawn, knight and king target tables, then the first piece
+        along each precomputed slider ray.
+        """
+        board = self.board
+        shift = by_color << 3
+
+        # a pawn of by_color attacks sq from where the other color's pawn would capture
+        pawn = PAWN | shift
+        for to in PAWN_CAPTURES[by_color ^ 1][sq]:
+            if board[to] == pawn:
+                return True
+
+        knight = KNIGHT | shift
+        for to in KNIGHT_TARGETS[sq]:
+            if board[to] == knight:
+                return True
+
+        king = KING | shift
+        for to in KING_TARGETS[sq]:
+            if board[to] == king:
+                return True
+
+        queen = QUEEN | shift
+        bishop = BISHOP | shift
+        for ray in BISHOP_RAYS[sq]:
+            for to in ray:
+                piece = board[to]
+                if piece != EMPTY:
+                    if piece == bishop or piece == queen:
+                        return True
+                    break
+
+        rook = ROOK | shift
+        for ray in ROOK_RAYS[sq]:
+            for to in ray:
+                piece = board[to]
+                if piece != EMPTY:
+                    if piece == rook or piece == queen:
+                        return True
+                    break
+
+        return False
+
+    def in_check(self, color):
+        king_sq = self.kings[color]
+        if king_sq is None:
+            return True  # no king -> treat as in check
+        return self.is_square_attacked(king_sq, color ^ 1)
+
+    def is_legal(self, move, color):
+        """True if move does not leave color's king in check."""
+        undo = self.make_move(move)
+        legal = not self.in_check(color)
+        self.unmake_move(move, undo)
+        return legal
+
+    def legal_moves(self, color):
+        """All legal moves for color as [(from_sq, to_sq, promotion), ...]."""
+        is_legal = self.is_legal
+        return [mv for mv in self.generate_moves(color) if is_legal(mv, color)]
+
+    # ---------- move notation ----------
+    def move_to_uci(self, move):
+        """Long algebraic (UCI) form of a move, e.g. 'e2e4' or 'e7e8q'."""
+        frm, to, promo = move
+        return square_name(frm) + square_name(to) + (_TYPE_CHARS[promo] if promo else '')
+
+    def parse_uci_move(self, text):
+        """The legal move matching a UCI string, or None."""
+        for mv in self.legal_moves(self.side):
+            if self.move_to_uci(mv) == text:
+                return mv
+        return None
+
+    def move_to_san(self, move, legal=None):
+        """
+        Standard algebraic (SAN) form of a legal move for the side to move,
+        e.g. 'Nbd7', 'exd5', 'O-O', 'e8=Q+'. legal: the side's legal moves,
+        if already at hand (needed to disambiguate).
+        """
+        san = self._san_without_check(move, legal)
+        side = self.side
+        undo = self.make_move(move)
+        if self.in_check(side ^ 1):
+            san += '#' if self.is_checkmate(side ^ 1) else '+'
+        self.unmake_move(move, undo)
+        return san
+
+    def _san_without_check(self, move, legal):
+        frm, to, promo = move
+        board = self.board
+        piece = board[frm]
+        ptype = piece & 7
+        if ptype == KING and abs(to - frm) == 2:
+            san = 'O-O' if to > frm else 'O-O-O'
+        elif ptype == PAWN:
+            san = square_name(frm)[0] + 'x' if frm % 10 != to % 10 else ''
+            san += square_name(to)
+            if promo:
+                san += '=' + _TYPE_CHARS[promo].upper()
+        else:
+            san = _TYPE_CHARS[ptype].upper()
+            if legal is None:
+                legal = self.legal_moves(self.side)
+            others = [mv[0] for mv in legal if mv[1] == to and mv[0] != frm and board[mv[0]] == piece]
+            if others:
+                name = square_name(frm)
+                if all(o % 10 != frm % 10 for o in others):
+                    san += name[0]
+                elif all(o // 10 != frm // 10 for o in others):
+                    san += name[1]
+                else:
+                    san += name
+            if board[to] != EMPTY:
+                san += 'x'
+            san += square_name(to)
+        return san
+
+    def parse_san(self, text):
+        """
+        The legal move matching a SAN string, or None. Check marks,
+        annotations ('!', '?') and a missing '=' before the promotion piece
+        are tolerated, as are castling written with zeros.
+        """
+        text = text.rstrip('+#!?').replace('=', '').replace('0-0', 'O-O')
+        legal = self.legal_moves(self.side)
+        for mv in legal:
+            if self._san_without_check(mv, legal).replace('=', '') == text:
+                return mv
+        return None
+
+    def is_checkmate(self, color):
+        if not self.in_check(color):
+            return False
+        for mv in self.generate_moves(color):
+            if self.is_legal(mv, color):
+                return False
+        return True
+
+    # ---------- evaluation ----------
+    def compute_eval(self):
+        """(mg, eg, phase) from scratch (make_move updates them incrementally)."""
+        board = self.board
+        mg = eg = phase = 0
+        for sq in SQUARES:
+            piece = board[sq]
+            if piece != EMPTY:
+                mg += EVAL_MG[piece][sq]
+                eg += EVAL_EG[piece][sq]
+                phase += PHASE[piece]
+        return mg, eg, phase
+
+    def evaluate(self):
+        """
+        Return evaluation in centipawns from Black's perspective: positive ->
+        Black advantage. Material and piece-square scores are kept as running
+        totals, so this only blends the middlegame and endgame terms by phase.
+        """
+        phase = self.phase
+        if phase > evaluation.MAX_PHASE:
+            phase = evaluation.MAX_PHASE
+        return (self.mg * phase + self.eg * (evaluation.MAX_PHASE - phase)) // evaluation.MAX_PHASE
+
+
+class GameState:
+    """
+    A position with its side to move's legal moves, generated once and
+    indexed by from-square, so piece selection and mate/stalemate checks
+    share one generation per ply. Make a new one after every move; moves
+    may be passed in when the caller already has the full legal list.
+    """
+    __slots__ = ('position', 'moves', 'by_from', '_move_set')
+
+    def __init__(self, position, moves=None):
+        self.position = position
+        if moves is None:
+            moves = position.legal_moves(position.side)
+        self.moves = moves
+        self._move_set = set(moves)
+        by_from = {}
+        for mv in moves:
+            by_from.setdefault(mv[0], []).append(mv)
+        self.by_from = by_from
+
+    def __contains__(self, move):
+        return move in self._move_set
+
+    def moves_from(self, sq):
+        """Legal moves of the piece on sq (empty unless it is the side to move's)."""
+        return self.by_from.get(sq, [])
+
+    @property
+    def in_check(self):
+        return self.position.in_check(self.position.side)
+
+    @property
+    def is_checkmate(self):
+        return not self.moves and self.in_check
+
+    @property
+    def is_stalemate(self):
+        return not self.moves and not self.in_check
+
+    @property
+    def insufficient_material(self):
+        """True with bare kings, or bare kings and a single bishop or knight."""
+        pos = self.position
+        if pos.piece_count > 3:
+            return False
+        return all(pos.board[sq] & 7 in (EMPTY, KING, KNIGHT, BISHOP) for sq in SQUARES)
+
+    @property
+    def fifty_moves(self):
+        """True once 50 moves have passed without a capture or pawn move."""
+        return self.position.halfmove >= 100
@@ -0,0 +1,161 @@
+"""
+Evaluation parameters: material values and piece-square tables, in
+centipawns, for the middlegame and the endgame.
+
+Every table is indexed by piece type (engine.PAWN .. engine.KING = 1..6)
+and then by square 0..63 from White's point of view, a8 first, which is
+also the GUI's row-major order. Black uses the same tables mirrored
+vertically. engine.py turns these into per-piece, per-mailbox-square
+lookups that Position updates incrementally in make_move/unmake_move.
+
+Values tuned by tune.py are written to TUNED_PATH and replace the
+hand-set ones below when the module is imported, so the GUI, worker
+processes and every tool pick them up. Delete the file to go back; a
+file that cannot be read is reported and the hand-set values are kept.
+"""
+import json
+import os
+import sys
+
+TUNED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eval_params.json')
+
+MG_VALUES = (0, 100, 320, 330, 500, 900, 0)
+EG_VALUES = (0, 120, 300, 320, 520, 900, 0)
+
+# game phase contributed by each piece type; 24 with all pieces on the board
+PHASE_WEIGHTS = (0, 0, 1, 1, 2, 4, 0)
+MAX_PHASE = 24
+
+_PAWN_MG = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+_PAWN_EG = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+     80,  80,  80,  80,  80,  80,  80,  80,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     30,  30,  30,  30,  30,  30,  30,  30,
+     15,  15,  15,  15,  15,  15,  15,  15,
+      5,   5,   5,   5,   5,   5,   5,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+_KNIGHT = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+_BISHOP = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+_ROOK = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0,
+)
+_QUEEN = (
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+)
+_KING_MG = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+)
+_KING_EG = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+
+PST_MG = (None, _PAWN_MG, _KNIGHT, _BISHOP, _ROOK, _QUEEN, _KING_MG)
+PST_EG = (None, _PAWN_EG, _KNIGHT, _BISHOP, _ROOK, _QUEEN, _KING_EG)
+
+
+# the hand-set parameters above, kept even when tuned ones are loaded
+BUILTIN = (MG_VALUES, EG_VALUES, PST_MG, PST_EG)
+
+
+def current_params():
+    """(mg_values, eg_values, pst_mg, pst_eg) in use."""
+    return MG_VALUES, EG_VALUES, PST_MG, PST_EG
+
+
+def read_params(path):
+    """(mg_values, eg_values, pst_mg, pst_eg) from a JSON file written by tune.py."""
+    with open(path, encoding='utf-8') as f:
+        params = json.load(f)
+    mg_values = tuple(int(v) for v in params['mg_values'])
+    eg_values = tuple(int(v) for v in params['eg_values'])
+    pst_mg = (None,) + tuple(tuple(int(v) for v in table) for table in params['pst_mg'])
+    pst_eg = (None,) + tuple(tuple(int(v) for v in table) for table in params['pst_eg'])
+    if (len(mg_values) != 7 or len(eg_values) != 7 or len(pst_mg) != 7 or len(pst_eg) != 7
+            or any(len(t) != 64 for t in pst_mg[1:] + pst_eg[1:])):
+        raise ValueError(f"{path}: expected 7 values and 6 tables of 64 per phase")
+    return mg_values, eg_values, pst_mg, pst_eg
+
+
+def load_params(path):
+    """
+    Replace the values and tables above with those in a JSON file written
+    by tune.py. Call engine.build_eval_tables() afterwards if engine is
+    already imported; positions created before then keep their old totals.
+    """
+    global MG_VALUES, EG_VALUES, PST_MG, PST_EG
+    MG_VALUES, EG_VALUES, PST_MG, PST_EG = read_params(path)
+
+
+def save_params(path, mg_values, eg_values, pst_mg, pst_eg):
+    """Write values and tables (indexed as above, PST without the leading None) as JSON."""
+    params = {'mg_values': [int(v) for v in mg_values], 'eg_values': [int(v) for v in eg_values],
+              'pst_mg': [[int(v) for v in t] for t in pst_mg],
+              'pst_eg': [[int(v) for v in t] for t in pst_eg]}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(params, f)
+        f.write('\n')
+
+
+if os.path.exists(TUNED_PATH):
+    try:
+        load_params(TUNED_PATH)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"warning: ignoring {TUNED_PATH}: {e}", file=sys.stderr)
@@ -1,11 +1,24 @@
-import tkinter as tk
+import os
+import queue
+import sys
 import random
 import time
-import math
-import threading
+from concurrent.futures import CancelledError
+
+from engine import Position, GameState, QUEEN, square, row_col
+from search import Searcher, InfoLog
+from api import Engine, SearchLimits
+from book import OpeningBook
 
 # ---------- CONFIG ----------
-AI_DEPTH = 3  # minimax depth (increase to make AI stronger; will be slower)
+AI_DEPTH = 6  # maximum minimax depth; the clock budget usually stops the search first
+TT_SIZE_MB = 16  # transposition table memory cap, kept across AI turns
+AI_WORKERS = 1  # >1 splits the search across that many worker processes
+SEARCH_LOG_PATH = None  # e.g. "search_log.jsonl": append per-iteration search stats, with phase timings
+PONDER = True  # keep searching the expected reply while White is thinking (single-process search only)
+BOOK_PATH = "book.bin"  # opening book built with book.py; ignored if the file does not exist
+ENGINE_POLL_MS = 20  # how often the GUI picks up search results and progress
+TABLEBASE_DIR = "tablebases"  # endgame tables generated with tablebase.py; ignored if missing
 # ----------------------------
 
 # ---------- piece glyphs ----------
@@ -15,22 +28,6 @@ pieces = {
     '.': ''
 }
 
-start_board = [
-    ['R','N','B','Q','K','B','N','R'],
-    ['P','P','P','P','P','P','P','P'],
-    ['.','.','.','.','.','.','.','.'],
-    ['.','.','.','.','.','.','.','.'],
-    ['.','.','.','.','.','.','.','.'],
-    ['.','.','.','.','.','.','.','.'],
-    ['p','p','p','p','p','p','p','p'],
-    ['r','n','b','q','k','b','n','r'],
-]
-
-# piece values for evaluation (positive for material)
-PIECE_VALUES = {
-    'p': 1, 'n': 3, 'b': 3, 'r': 5, 'q': 9, 'k': 200
-}
-
 # ---------- Main Game Class ----------
 class ChessGame:
     def __init__(self, root, mode='two'):
@@ -67,21 +64,43 @@ class ChessGame:
 
         # Game state
         self.cell_size = 80
-        self.board = [row[:] for row in start_board]
+        self.position = Position.start()
+        self.state = GameState(self.position)  # legal moves of the side to move, once per ply
         self.selected = None
-        self.valid_moves = []
+        self.valid_moves = set()
+        self.selected_moves = {}  # (row, col) target -> engine move for the selection
         self.turn = 'white'     # 'white' uses lowercase pieces (user)
         self.game_running = True
 
+        # Canvas items are created once and updated in place by draw_board;
+        # the shown fill/text per square lets it touch only what changed
+        self.square_items = {}  # (row, col) -> rectangle id
+        self.piece_items = {}   # (row, col) -> text id
+        self.shown_fill = {}
+        self.shown_piece = {}
+
         # Timers in seconds
         self.remaining = {'white': 10 * 60, 'black': 10 * 60}  # 10 minutes each
         self._timer_job = None
 
         # AI state
         self.ai_thinking = False
-
-        # Bind clicks
+        self.engine = Engine(tt_mb=TT_SIZE_MB, workers=AI_WORKERS, profile=SEARCH_LOG_PATH is not None,
+                             tablebase_dir=TABLEBASE_DIR)
+        self.search_log = InfoLog(SEARCH_LOG_PATH) if SEARCH_LOG_PATH else None
+        self.book = OpeningBook(BOOK_PATH) if BOOK_PATH and os.path.exists(BOOK_PATH) else None
+        self.ponder_future = None
+        self.ponder_move = None   # White reply the ponder search assumed, or None
+        self.ponder_start = 0.0
+        self.last_move = None     # White's most recent move
+        # the engine thread never calls Tk: it queues callbacks that
+        # _poll_engine runs on the Tk thread
+        self.engine_events = queue.Queue()
+        self._poll_job = None
+
+        # Bind clicks; closing the window stops any search still running
         self.canvas.bind("<Button-1>", self.click)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
 
         # Draw initial
         self.draw_board()
@@ -89,10 +108,22 @@ class ChessGame:
         # start timer loop
         self.last_tick = time.time()
         self._tick()
+        self._poll_engine()
 
     # ---------- drawing ----------
+    def _create_board_items(self):
+        """One rectangle and one (possibly empty) text item per square."""
+        for i in range(8):
+            for j in range(8):
+                x1, y1 = j * self.cell_size, i * self.cell_size
+                x2, y2 = x1 + self.cell_size, y1 + self.cell_size
+                self.square_items[(i, j)] = self.canvas.create_rectangle(x1, y1, x2, y2, outline='black')
+                self.piece_items[(i, j)] = self.canvas.create_text(
+                    x1 + self.cell_size/2, y1 + self.cell_size/2, text='', font=("Arial", 44))
+
     def draw_board(self):
-        self.canvas.delete("all")
+        if not self.square_items:
+            self._create_board_items()
 
         # Chess.com colors
         light = "#EEEED2"
@@ -100,11 +131,10 @@ class ChessGame:
         highlight_move = "#BACA44"   # Chess.com style move highlight
         selected_sq = "#F6F669"      # Chess.com selected square
 
+        shown_fill = self.shown_fill
+        shown_piece = self.shown_piece
         for i in range(8):
             for j in range(8):
-                x1, y1 = j * self.cell_size, i * self.cell_size
-                x2, y2 = x1 + self.cell_size, y1 + self.cell_size
-
                 base_color = light if (i + j) % 2 == 0 else dark
 
                 # highlight precedence: selected square > valid moves > base color
@@ -115,12 +145,14 @@ class ChessGame:
                 else:
                     color = base_color
 
-                self.canvas.create_rectangle(x1, y1, x2, y2, fill=color, outline='black')
+                if shown_fill.get((i, j)) != color:
+                    self.canvas.itemconfigure(self.square_items[(i, j)], fill=color)
+                    shown_fill[(i, j)] = color
 
-                piece = self.board[i][j]
-                if piece != '.':
-                    self.canvas.create_text(x1 + self.cell_size/2, y1 + self.cell_size/2,
-                                            text=pieces[piece], font=("Arial", 44))
+                piece = self.position.piece_char(i, j)
+                if shown_piece.get((i, j)) != piece:
+                    self.canvas.itemconfigure(self.piece_items[(i, j)], text=pieces[piece])
+                    shown_piece[(i, j)] = piece
 
         # Optional: show whose turn in title
         self.root.title(f"Chess - {'White' if self.turn=='white' else 'Black'} to move - Mode: {'AI' if self.mode=='ai' else 'Two Player'}")
@@ -140,44 +172,51 @@ class ChessGame:
         # If a move is selected previously
         if self.selected:
             if (row, col) in self.valid_moves:
-                sr, sc = self.selected
-                piece = self.board[sr][sc]
-
-                # Make move
-                self.board[row][col] = piece
-                self.board[sr][sc] = '.'
+                # Make move (pawns reaching the last rank promote to a queen)
+                self.last_move = self.selected_moves[(row, col)]
+                self.position.make_move(self.last_move)
+                self.state = GameState(self.position)
 
-                # After move, check for checkmate
+                # After move, check for checkmate or stalemate
                 opponent = 'black' if self.turn == 'white' else 'white'
-                if self.is_checkmate_board(self.board, opponent):
+                if self.state.is_checkmate:
                     self.draw_board()
                     self.game_over(f"{self.turn.capitalize()} wins by checkmate!")
                     return
+                if self.state.is_stalemate:
+                    self.draw_board()
+                    self.game_over("Stalemate!")
+                    return
 
                 # Switch turn
                 self.turn = opponent
                 self.selected = None
-                self.valid_moves = []
+                self.valid_moves = set()
                 self.draw_board()
 
-                # If AI mode and it's AI's turn, run AI in background thread
+                # If AI mode and it's AI's turn, search on the engine thread
                 if self.mode == 'ai' and self.turn == 'black' and self.game_running:
                     self.ai_thinking = True
                     self.ai_thinking_var.set("AI thinking...")
-                    threading.Thread(target=self.ai_move_minimax_thread, daemon=True).start()
+                    self.start_ai_move()
                 return
 
             # else clear selection
             self.selected = None
-            self.valid_moves = []
+            self.valid_moves = set()
             self.draw_board()
             return
 
         # No previously selected piece: try to select
-        piece = self.board[row][col]
+        piece = self.position.piece_char(row, col)
         if piece != '.' and self.is_correct_turn(piece):
             self.selected = (row, col)
-            self.valid_moves = self.get_legal_moves(r=row, c=col, board=self.board, turn=self.turn)
+            self.selected_moves = {}
+            for mv in self.state.moves_from(square(row, col)):
+                target = row_col(mv[1])
+                if target not in self.selected_moves or mv[2] == QUEEN:
+                    self.selected_moves[target] = mv
+            self.valid_moves = set(self.selected_moves)
             self.draw_board()
 
     # mapping turn -> piece case (kept your convention)
@@ -187,289 +226,98 @@ class ChessGame:
     # ---------- Game over ----------
     def game_over(self, message):
         self.game_running = False
+        self.engine.stop()
         self.canvas.unbind("<Button-1>")
         self.canvas.create_rectangle(0, 280, 640, 360, fill='black', stipple='gray50')
         self.canvas.create_text(320, 320, text=message, font=("Arial", 28), fill="red")
 
-    # ---------- legal moves & move generation (board param) ----------
-    def get_legal_moves(self, r, c, board=None, turn=None):
-        """
-        Returns list of (mr,mc) legal moves for piece at r,c on given board and turn.
-        If board is None -> self.board. If turn is None -> self.turn.
-        """
-        if board is None:
-            board = self.board
-        if turn is None:
-            turn = self.turn
-
-        piece = board[r][c]
-        moves = self.get_piece_moves(r, c, piece, board=board)
-        legal = []
-        for mr, mc in moves:
-            temp = [row[:] for row in board]
-            temp[mr][mc] = piece
-            temp[r][c] = '.'
-            if not self.in_check_board(temp, turn):
-                legal.append((mr, mc))
-        return legal
-
-    def get_piece_moves(self, r, c, piece, board=None):
-        if board is None:
-            board = self.board
-
-        directions = {
-            'n': [(-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1)],
-            'b': [(-1,-1),(-1,1),(1,-1),(1,1)],
-            'r': [(-1,0),(1,0),(0,-1),(0,1)],
-            'q': [(-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1)],
-            'k': [(-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1)],
-        }
-
-        moves = []
-        if piece == '.':
-            return moves
-
-        is_white = piece.islower()
-        p = piece.lower()
-
-        def inside(x, y):
-            return 0 <= x < 8 and 0 <= y < 8
-
-        def add_move(x, y):
-            if not inside(x, y):
-                return False
-            target = board[x][y]
-            if target == '.' or (target.isupper() != piece.isupper()):
-                moves.append((x, y))
-                return target == '.'  # continue sliding only if empty
-            return False
-
-        if p == 'p':
-            step = -1 if is_white else 1
-            start_row = 6 if is_white else 1
-            # forward
-            if inside(r + step, c) and board[r + step][c] == '.':
-                moves.append((r + step, c))
-                if r == start_row and inside(r + 2*step, c) and board[r + 2*step][c] == '.':
-                    moves.append((r + 2*step, c))
-            # captures
-            for dc in (-1, 1):
-                nr, nc = r + step, c + dc
-                if inside(nr, nc) and board[nr][nc] != '.' and (board[nr][nc].isupper() != piece.isupper()):
-                    moves.append((nr, nc))
-
-        elif p == 'n':
-            for dr, dc in directions['n']:
-                add_move(r + dr, c + dc)
-
-        elif p in ('b', 'r', 'q'):
-            for dr, dc in directions[p]:
-                x, y = r + dr, c + dc
-                while add_move(x, y):
-                    x += dr
-                    y += dc
-
-        elif p == 'k':
-            for dr, dc in directions['k']:
-                add_move(r + dr, c + dc)
-
-        return moves
-
-    # ---------- find king ----------
-    def find_king_board(self, board, color):
-        king = 'k' if color == 'white' else 'K'
-        for i in range(8):
-            for j in range(8):
-                if board[i][j] == king:
-                    return (i, j)
-        return None
-
-    # ---------- check detection (board versions) ----------
-    def in_check_board(self, board, color):
-        king_pos = self.find_king_board(board, color)
-        if king_pos is None:
-            return True  # no king -> treat as in check
-
-        for r in range(8):
-            for c in range(8):
-                piece = board[r][c]
-                if piece == '.':
-                    continue
-                # Skip own pieces
-                if (color == 'white' and piece.islower()) or (color == 'black' and piece.isupper()):
-                    continue
-                moves = self.get_piece_moves(r, c, piece, board=board)
-                if king_pos in moves:
-                    return True
-        return False
-
-    def is_checkmate_board(self, board, color):
-        if not self.in_check_board(board, color):
-            return False
-        # iterate all pieces of color
-        for r in range(8):
-            for c in range(8):
-                piece = board[r][c]
-                if piece == '.':
-                    continue
-                # only consider pieces of `color`
-                if (color == 'white' and piece.isupper()) or (color == 'black' and piece.islower()):
-                    continue
-                for mr, mc in self.get_piece_moves(r, c, piece, board=board):
-                    temp = [row[:] for row in board]
-                    temp[mr][mc] = piece
-                    temp[r][c] = '.'
-                    if not self.in_check_board(temp, color):
-                        return False
-        return True
-
-    # ---------- Minimax & helpers ----------
-    def evaluate_board(self, board):
-        """
-        Return evaluation from Black's perspective: positive -> Black advantage.
-        """
-        black_score = 0
-        white_score = 0
-        for r in range(8):
-            for c in range(8):
-                piece = board[r][c]
-                if piece == '.':
-                    continue
-                val = PIECE_VALUES.get(piece.lower(), 0)
-                if piece.isupper():
-                    black_score += val
-                else:
-                    white_score += val
-        return black_score - white_score
-
-    def generate_all_legal_moves(self, board, color):
-        """
-        Return list of moves for color on board as [((r,c),(mr,mc)), ...]
-        color: 'white' or 'black'
-        """
-        result = []
-        for r in range(8):
-            for c in range(8):
-                piece = board[r][c]
-                if piece == '.':
-                    continue
-                if color == 'white' and piece.isupper():
-                    continue
-                if color == 'black' and piece.islower():
-                    continue
-                legal = self.get_legal_moves(r, c, board=board, turn=color)
-                for (mr, mc) in legal:
-                    result.append(((r, c), (mr, mc)))
-        return result
-
-    def make_move_on_board(self, board, move):
+    def close(self):
+        self.game_running = False
+        if self._poll_job is not None:
+            self.root.after_cancel(self._poll_job)
+        # safe to wait: the engine thread only touches engine_events, never Tk
+        self.engine.shutdown()
+        if self.book is not None:
+            self.book.close()
+        self.root.destroy()
+
+    # ---------- AI move ----------
+    def start_ai_move(self):
         """
-        Return a new board after applying move=((sr,sc),(tr,tc))
+        Start the AI search on the engine thread, within a time budget taken
+        from Black's remaining clock. When the search future completes its
+        result is queued for _poll_engine to handle on the main thread.
         """
-        (sr, sc), (tr, tc) = move
-        newb = [row[:] for row in board]
-        newb[tr][tc] = newb[sr][sc]
-        newb[sr][sc] = '.'
-        return newb
+        snapshot = self.position.copy()
+        limits = SearchLimits.for_clock(self.remaining['black'], snapshot.fullmove, AI_DEPTH)
+        ponder = self._finish_ponder(self.last_move)
+        book_move = self.book.choose(snapshot) if self.book is not None else None
+        if book_move is not None:
+            self._apply_ai_move(book_move)
+            return
+        if ponder is not None:
+            pondered, (val, best_move, depth) = ponder
+            if pondered >= limits.soft_time and best_move is not None:
+                # ponder hit that already used this move's budget: play its result
+                self._apply_ai_move(best_move)
+                return
+            # ponder hit: the table holds the pondered iterations, so they
+            # come back almost at once; credit the time already spent
+            limits.soft_time -= pondered
 
-    def minimax(self, board, depth, alpha, beta, maximizing_player):
-        """
-        Minimax with alpha-beta.
-        maximizing_player: True when it's Black's turn (AI), False for White (human).
-        Returns (best_value, best_move) where best_move is ((sr,sc),(tr,tc)) or None.
-        """
-        # Terminal checks: checkmates
-        if self.is_checkmate_board(board, 'white'):
-            return (10000, None)
-        if self.is_checkmate_board(board, 'black'):
-            return (-10000, None)
-
-        # generate moves
-        black_moves = self.generate_all_legal_moves(board, 'black')
-        white_moves = self.generate_all_legal_moves(board, 'white')
-
-        if depth == 0 or (not black_moves and not white_moves):
-            return (self.evaluate_board(board), None)
-
-        if maximizing_player:
-            max_eval = -math.inf
-            best_move = None
-            moves = black_moves
-            # simple ordering: prioritize captures
-            def move_score(mv):
-                (sr, sc), (tr, tc) = mv
-                target = board[tr][tc]
-                return PIECE_VALUES.get(target.lower(), 0)
-            moves.sort(key=move_score, reverse=True)
-
-            for mv in moves:
-                newb = self.make_move_on_board(board, mv)
-                val, _ = self.minimax(newb, depth-1, alpha, beta, False)
-                if val > max_eval:
-                    max_eval = val
-                    best_move = mv
-                alpha = max(alpha, val)
-                if beta <= alpha:
-                    break
-            return (max_eval, best_move)
-        else:
-            min_eval = math.inf
-            best_move = None
-            moves = white_moves
-            def move_score(mv):
-                (sr, sc), (tr, tc) = mv
-                target = board[tr][tc]
-                return PIECE_VALUES.get(target.lower(), 0)
-            moves.sort(key=move_score, reverse=True)
-
-            for mv in moves:
-                newb = self.make_move_on_board(board, mv)
-                val, _ = self.minimax(newb, depth-1, alpha, beta, True)
-                if val < min_eval:
-                    min_eval = val
-                    best_move = mv
-                beta = min(beta, val)
-                if beta <= alpha:
-                    break
-            return (min_eval, best_move)
+        future = self.engine.search(snapshot, limits, on_info=self._on_search_info)
+        future.add_done_callback(lambda f: self.engine_events.put(lambda: self._ai_search_done(f)))
 
-    # ---------- AI thread entrypoint ----------
-    def ai_move_minimax_thread(self):
-        """
-        This runs in a background thread. Compute best move (pure CPU work),
-        then schedule the UI update on main thread via root.after.
-        """
-        if not self.game_running:
+    def _ai_search_done(self, future):
+        # called on main thread once the AI search has finished or was stopped
+        if future.cancelled() or not self.game_running:
             self.ai_thinking = False
             self.ai_thinking_var.set("")
             return
+        val, best_move, depth = future.result()
 
-        # compute best move using minimax on current board snapshot
-        board_snapshot = [row[:] for row in self.board]
-        val, best_move = self.minimax(board_snapshot, AI_DEPTH, -math.inf, math.inf, True)
-
-        # fallback: if no move found, get legal moves
+        # fallback: if no move found, pick any legal move
         if best_move is None:
-            moves = self.generate_all_legal_moves(board_snapshot, 'black')
-            if not moves:
-                # schedule endgame handling on main thread
-                self.root.after(0, lambda: self._handle_ai_no_moves(board_snapshot))
+            if not self.state.moves:
+                self._handle_ai_no_moves()
                 return
-            best_move = random.choice(moves)
+            best_move = random.choice(self.state.moves)
+        self._apply_ai_move(best_move)
+
+    def _on_search_info(self, info):
+        # called from the engine thread after every completed iteration
+        if self.search_log is not None:
+            self.search_log(info)
+        self.engine_events.put(lambda: self._show_search_info(info))
+
+    def _poll_engine(self):
+        # runs on the Tk thread: handle whatever the engine thread queued
+        try:
+            while True:
+                try:
+                    callback = self.engine_events.get_nowait()
+                except queue.Empty:
+                    break
+                callback()
+        finally:
+            self._poll_job = self.root.after(ENGINE_POLL_MS, self._poll_engine)
 
-        # schedule applying the move on the main thread
-        self.root.after(0, lambda: self._apply_ai_move_from_thread(best_move))
+    def _show_search_info(self, info):
+        if not self.ai_thinking:
+            return
+        self.ai_thinking_var.set(f"AI thinking... depth {info['depth']}, {info['nodes']} nodes, "
+                                 f"{info['nps'] // 1000} kN/s, pv {' '.join(info['pv'][:4])}")
 
-    def _handle_ai_no_moves(self, board_snapshot):
+    def _handle_ai_no_moves(self):
         # called on main thread if AI had no moves
-        if self.in_check_board(board_snapshot, 'black'):
+        if self.state.in_check:
             self.game_over("White wins by checkmate!")
         else:
             self.game_over("Stalemate!")
         self.ai_thinking = False
         self.ai_thinking_var.set("")
 
-    def _apply_ai_move_from_thread(self, move):
+    def _apply_ai_move(self, move):
         """
         Apply the AI move on the main thread (safe to touch UI).
         """
@@ -479,12 +327,13 @@ class ChessGame:
             return
 
         # make move
-        self.board = self.make_move_on_board(self.board, move)
+        self.position.make_move(move)
+        self.state = GameState(self.position)
 
-        # check for checkmate for opponent
-        if self.is_checkmate_board(self.board, 'white'):
+        # check for checkmate or stalemate for opponent
+        if self.state.is_checkmate or self.state.is_stalemate:
             self.draw_board()
-            self.game_over("Black (AI) wins by checkmate!")
+            self.game_over("Black (AI) wins by checkmate!" if self.state.is_checkmate else "Stalemate!")
             self.ai_thinking = False
             self.ai_thinking_var.set("")
             return
@@ -492,10 +341,49 @@ class ChessGame:
         # switch turn back to white
         self.turn = 'white'
         self.selected = None
-        self.valid_moves = []
+        self.valid_moves = set()
         self.ai_thinking = False
         self.ai_thinking_var.set("")
         self.draw_board()
+        self._start_ponder(move)
+
+    # ---------- Pondering ----------
+    def _start_ponder(self, played):
+        """
+        Search on White's time. If the search that chose `played` predicted
+        White's reply, search the position after it; otherwise search the
+        current position, which fills the shared table for every reply.
+        """
+        if not (PONDER and self.mode == 'ai' and self.game_running
+                and isinstance(self.engine.searcher, Searcher)):
+            return
+        pos = self.position.copy()
+        pv = self.engine.searcher.pv
+        self.ponder_move = None
+        if len(pv) > 1 and pv[0] == played and pv[1] in self.state:
+            self.ponder_move = pv[1]
+            pos.make_move(self.ponder_move)
+        self.ponder_start = time.perf_counter()
+        self.ponder_future = self.engine.search(pos, SearchLimits(depth=AI_DEPTH))
+
+    def _finish_ponder(self, played):
+        """
+        Stop the ponder search and wait for it to exit. If it was searching
+        the position after `played`, returns (seconds pondered, its result);
+        otherwise None.
+        """
+        future = self.ponder_future
+        if future is None:
+            return None
+        self.ponder_future = None
+        self.engine.stop()
+        try:
+            result = future.result()
+        except CancelledError:
+            return None
+        if self.ponder_move is None or self.ponder_move != played:
+            return None
+        return time.perf_counter() - self.ponder_start, result
 
     # ---------- Timer handling ----------
     def _tick(self):
@@ -562,6 +450,13 @@ class Menu:
 
 # ---------- run ----------
 if __name__ == "__main__":
+    if "--uci" in sys.argv[1:]:
+        # headless: speak UCI on stdin/stdout instead of opening a window
+        import uci
+        sys.exit(uci.main(tt_mb=TT_SIZE_MB, workers=AI_WORKERS, tablebase_dir=TABLEBASE_DIR))
+    # imported here, not at the top: --uci and the spawned search workers
+    # (which re-import this file) must run without Tk installed
+    import tkinter as tk
     root = tk.Tk()
     Menu(root)
     root.mainloop()
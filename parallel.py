@@ -0,0 +1,173 @@
+"""
+Multi-process root-splitting search.
+
+Threads cannot run minimax on more than one core because of the GIL, so
+ParallelSearcher hands root moves to a pool of worker processes. Each
+worker keeps its own Searcher (and transposition table) alive between
+calls, so work from earlier iterations and earlier moves is reused.
+
+At every iteration the previous best root move is searched first to get a
+bound (young-brothers-wait); the remaining root moves are then searched
+concurrently against that bound.
+"""
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from engine import BLACK
+from search import Searcher, SearchTimeout, MATE_BOUND
+from tablebase import Tablebases
+
+# per-process state, set up by _init_worker
+_worker_searcher = None
+_worker_generation = None
+
+
+def _init_worker(tt_mb, stop_event, tablebase_dir):
+    global _worker_searcher
+    tablebases = Tablebases(tablebase_dir) if tablebase_dir is not None else None
+    _worker_searcher = Searcher(tt_mb=tt_mb, tablebases=tablebases)
+    # shared with the parent, so ParallelSearcher.stop() reaches every worker
+    _worker_searcher.stop_event = stop_event
+
+
+def _search_root_move(pos, move, depth, alpha, beta, maximizing, deadline, generation):
+    """
+    Worker task: search one root move to depth with the given window.
+    deadline is wall-clock time.time() (comparable across processes) or None.
+    Returns (value, nodes), or (None, nodes) if the deadline was hit or the
+    search was stopped.
+    """
+    global _worker_generation
+    searcher = _worker_searcher
+    if generation != _worker_generation:
+        searcher.tt.new_search()
+        searcher.clear_heuristics()
+        searcher.pv = []
+        _worker_generation = generation
+
+    searcher.nodes = 0
+    if deadline is not None:
+        searcher.deadline = time.perf_counter() + (deadline - time.time())
+    pos.make_move(move)
+    try:
+        val, _ = searcher.minimax(pos, depth - 1, alpha, beta, not maximizing, 1)
+    except SearchTimeout:
+        val = None
+    finally:
+        searcher.deadline = None
+    return val, searcher.nodes
+
+
+class ParallelSearcher:
+    """
+    Drop-in replacement for Searcher.search() that uses `workers` processes.
+    Each worker loads its own copy of the tablebases in tablebase_dir, if
+    given, and probes them below the root.
+    """
+    def __init__(self, workers=2, tt_mb=16, tablebase_dir=None):
+        self.workers = workers
+        self.nodes = 0
+        self.pv = []
+        self._generation = 0
+        # spawn, not fork: the parent may be running a Tk event loop
+        context = multiprocessing.get_context('spawn')
+        self.stop_event = context.Event()
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                        initializer=_init_worker, initargs=(tt_mb, self.stop_event, tablebase_dir))
+
+    def stop(self):
+        """Ask the running search to return as soon as possible, as Searcher.stop()."""
+        self.stop_event.set()
+
+    def shutdown(self):
+        self.stop_event.set()
+        # wait: a worker still starting up unpickles stop_event, which fails
+        # once this process has exited and released it
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def search(self, pos, max_depth, soft_time=None, hard_time=None, on_info=None, max_nodes=None):
+        """
+        Iterative deepening over root moves split across the worker pool.
+        Same contract as Searcher.search: returns (best_value, best_move, depth)
+        from the last completed iteration, and calls on_info after each one
+        (workers do not report table or per-phase statistics). max_nodes is
+        only checked between iterations.
+        """
+        try:
+            return self._search(pos, max_depth, soft_time, hard_time, on_info, max_nodes)
+        finally:
+            self.stop_event.clear()
+
+    def _search(self, pos, max_depth, soft_time, hard_time, on_info, max_nodes):
+        start = time.time()
+        self._generation += 1
+        self.nodes = 0
+        maximizing = pos.side == BLACK
+        moves = pos.legal_moves(pos.side)
+        if not moves:
+            return (None, None, 0)
+
+        result = (None, None, 0)
+        for depth in range(1, max_depth + 1):
+            deadline = start + hard_time if hard_time is not None and depth > 1 else None
+            iteration = self._search_depth(pos, moves, depth, maximizing, deadline)
+            if iteration is None:
+                break  # hard limit hit or stopped: keep the last completed iteration
+            val, best = iteration
+            result = (val, best, depth)
+            self.pv = [best]
+            if on_info is not None:
+                elapsed = time.time() - start
+                on_info({'depth': depth, 'score': val, 'nodes': self.nodes,
+                         'nps': int(self.nodes / elapsed) if elapsed > 0 else 0,
+                         'time_ms': int(elapsed * 1000), 'pv': [pos.move_to_uci(best)]})
+            # previous best move goes first in the next iteration
+            moves.remove(best)
+            moves.insert(0, best)
+            if abs(val) >= MATE_BOUND:
+                break
+            if soft_time is not None and time.time() - start >= soft_time:
+                break
+            if max_nodes is not None and self.nodes >= max_nodes:
+                break
+        return result
+
+    def _search_depth(self, pos, moves, depth, maximizing, deadline):
+        submit = self.pool.submit
+        generation = self._generation
+
+        # search the first (expected best) move alone to establish a bound
+        first = moves[0]
+        val, nodes = submit(_search_root_move, pos, first, depth, -math.inf, math.inf,
+                            maximizing, deadline, generation).result()
+        self.nodes += nodes
+        if val is None:
+            return None
+        best_val, best = val, first
+        if len(moves) == 1:
+            return best_val, best
+
+        # then everything else in parallel against that bound
+        if maximizing:
+            alpha, beta = best_val, math.inf
+        else:
+            alpha, beta = -math.inf, best_val
+        futures = [(mv, submit(_search_root_move, pos, mv, depth, alpha, beta,
+                               maximizing, deadline, generation))
+                   for mv in moves[1:]]
+        for mv, fut in futures:
+            val, nodes = fut.result()
+            self.nodes += nodes
+            if val is None:
+                for _, other in futures:
+                    other.cancel()
+                # tasks already handed to a worker cannot be cancelled; wait
+                # until they have seen the stop (or deadline) so search() does
+                # not clear the shared stop_event under them
+                wait([other for _, other in futures])
+                return None
+            if (val > best_val) if maximizing else (val < best_val):
+                best_val, best = val, mv
+        return best_val, best
@@ -0,0 +1,116 @@
+"""
+Minimal PGN reading and writing. Reading keeps tag pairs and main-line
+SAN moves; comments, NAGs, move numbers and variations are skipped.
+"""
+import re
+
+from engine import Position, START_FEN, WHITE, BLACK
+
+_TAG = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+_COMMENT = re.compile(r'\{[^}]*\}|;[^\n]*')
+_MOVE_NUMBER = re.compile(r'^\d+\.+')
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+
+def _strip_variations(text):
+    """Drop (...) variations, which may be nested."""
+    out = []
+    depth = 0
+    for ch in text:
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth = max(0, depth - 1)
+        elif depth == 0:
+            out.append(ch)
+    return ''.join(out)
+
+
+def _parse_game(headers, movetext):
+    text = _strip_variations(_COMMENT.sub(' ', movetext))
+    sans = []
+    for token in text.split():
+        token = _MOVE_NUMBER.sub('', token)
+        if not token or token.startswith('$') or token in RESULTS:
+            continue
+        sans.append(token)
+    return headers, sans
+
+
+def read_games(f):
+    """
+    Yield (headers, sans) for every game in an open PGN text file, where
+    headers is a dict of tag pairs and sans the main line in SAN.
+    """
+    headers = {}
+    movetext = []
+    for line in f:
+        line = line.strip()
+        if line.startswith('['):
+            if movetext:
+                yield _parse_game(headers, ' '.join(movetext))
+                headers, movetext = {}, []
+            match = _TAG.match(line)
+            if match:
+                headers[match.group(1)] = match.group(2)
+        elif line and not line.startswith('%'):
+            movetext.append(line)
+    if movetext or headers:
+        yield _parse_game(headers, ' '.join(movetext))
+
+
+def game_moves(headers, sans):
+    """
+    The start position of a game and its main line as engine moves. Stops
+    at the first move that does not parse or is illegal.
+    """
+    pos = Position.from_fen(headers.get('FEN', START_FEN))
+    start = pos.copy()
+    moves = []
+    for san in sans:
+        mv = pos.parse_san(san)
+        if mv is None:
+            break
+        moves.append(mv)
+        pos.make_move(mv)
+    return start, moves
+
+
+# ---------- writing ----------
+_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+
+
+def write_game(f, headers, start, sans):
+    """
+    Write one game to an open text file: the seven-tag roster first (with
+    '?' for missing tags), then any other headers, then the moves from the
+    start position wrapped at 80 columns.
+    """
+    for tag in _ROSTER:
+        f.write(f'[{tag} "{headers.get(tag, "?" if tag != "Result" else "*")}"]\n')
+    for tag, value in headers.items():
+        if tag not in _ROSTER:
+            f.write(f'[{tag} "{value}"]\n')
+    f.write('\n')
+
+    tokens = []
+    number, side = start.fullmove, start.side
+    for i, san in enumerate(sans):
+        if side == WHITE:
+            tokens.append(f'{number}.')
+        elif i == 0:
+            tokens.append(f'{number}...')
+        tokens.append(san)
+        if side == BLACK:
+            number += 1
+        side ^= 1
+    tokens.append(headers.get('Result', '*'))
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 80:
+            f.write(line + '\n')
+            line = token
+        else:
+            line = f'{line} {token}' if line else token
+    f.write(line + '\n\n')
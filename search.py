@@ -0,0 +1,564 @@
+"""
+Minimax search over engine.Position. Headless: safe to run in worker
+threads or processes without a display.
+"""
+import json
+import math
+import threading
+import time
+from array import array
+
+from engine import BLACK, EMPTY
+
+# transposition table bound types
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# how often (in nodes) the search looks at the clock, node limit and stop flag
+TIME_CHECK_INTERVAL = 256
+
+# mate scores are MATE_SCORE minus the distance in plies, so quicker mates
+# score higher; anything beyond MATE_BOUND is a forced mate. The margin
+# leaves room for tablebase distances, which can exceed MAX_PLY.
+MATE_SCORE = 10000
+MAX_PLY = 64
+MATE_BOUND = MATE_SCORE - 512
+
+# move ordering bands: PV move, table move, captures (MVV-LVA), killers,
+# then quiet moves by history score (capped below the killer band)
+ORDER_PV = 1 << 30
+ORDER_TT = 1 << 29
+ORDER_CAPTURE = 1 << 28
+ORDER_KILLER = 1 << 27
+HISTORY_MAX = ORDER_KILLER - 2
+
+
+class SearchTimeout(Exception):
+    """Raised inside minimax when a time or node limit is reached or stop() was called."""
+
+
+# ---------- time management ----------
+def allocate_time(remaining, move_number):
+    """
+    Split the remaining clock (seconds) into a (soft, hard) budget for one move.
+    move_number is the full-move number (1 for the first move of the game).
+
+    The soft limit is a fair share of the clock for the expected number of
+    moves left; no new iteration is started once it has passed. The hard
+    limit aborts the iteration in progress and is capped so that a single
+    move can never spend more than a fraction of the clock.
+    """
+    moves_left = max(10, 40 - move_number)
+    soft = remaining / moves_left
+    hard = min(soft * 2.5, remaining * 0.2)
+    return soft, max(hard, soft)
+
+
+def tablebase_score(hit, ply, side):
+    """Search score (Black's point of view) for a tablebase (result, plies to mate) at ply."""
+    result, dtm = hit
+    score = result * (MATE_SCORE - ply - dtm) if result else 0
+    return score if side == BLACK else -score
+
+
+# ---------- transposition table ----------
+def score_to_tt(score, ply):
+    """Store mate scores relative to the stored node rather than the root."""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def encode_move(move):
+    """Pack a (from_sq, to_sq, promotion) move into 17 bits (0 means no move)."""
+    if move is None:
+        return 0
+    return move[0] | (move[1] << 7) | (move[2] << 14)
+
+
+def decode_move(code):
+    if code == 0:
+        return None
+    return (code & 0x7F, (code >> 7) & 0x7F, code >> 14)
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of search results keyed by Zobrist key.
+
+    Each bucket holds two entries: a depth-preferred slot, replaced only by
+    searches at least as deep (or by anything once the entry is from an
+    older search), and an always-replace slot. An entry is a 64-bit key plus
+    one 64-bit word packing score, age, depth, bound type and best move, so
+    the memory cap translates directly into the number of buckets.
+    """
+    ENTRY_BYTES = 16
+
+    def __init__(self, size_mb=16):
+        self.size_mb = size_mb
+        self.buckets = max(1, (size_mb * 1024 * 1024) // (2 * self.ENTRY_BYTES))
+        self.keys = array('Q', [0]) * (self.buckets * 2)
+        self.data = array('q', [0]) * (self.buckets * 2)
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.overwrites = 0
+
+    def clear(self):
+        n = self.buckets * 2
+        self.keys = array('Q', [0]) * n
+        self.data = array('q', [0]) * n
+        self.hits = self.misses = self.overwrites = 0
+
+    def new_search(self):
+        """Mark existing entries as older so the depth-preferred slots can be reclaimed."""
+        self.age = (self.age + 1) & 0x3F
+
+    def probe(self, key):
+        """Return (depth, score, bound, move) for key, or None."""
+        i = (key % self.buckets) * 2
+        keys = self.keys
+        if keys[i] == key:
+            word = self.data[i]
+        elif keys[i + 1] == key:
+            word = self.data[i + 1]
+        else:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ((word >> 19) & 0xFF, word >> 33, (word >> 17) & 0x3, decode_move(word & 0x1FFFF))
+
+    def store(self, key, depth, score, bound, move):
+        # word layout: score | age:6 | depth:8 | bound:2 | move:17
+        word = (int(score) << 33) | (self.age << 27) | (depth << 19) | (bound << 17) | encode_move(move)
+        i = (key % self.buckets) * 2
+        keys = self.keys
+        data = self.data
+        old_key = keys[i]
+        old_word = data[i]
+        if (old_key == key or old_key == 0 or depth >= ((old_word >> 19) & 0xFF)
+                or ((old_word >> 27) & 0x3F) != self.age):
+            if old_key != key and old_key != 0:
+                # demote the previous depth-preferred entry instead of losing it
+                if keys[i + 1] != 0 and keys[i + 1] != old_key:
+                    self.overwrites += 1
+                keys[i + 1] = old_key
+                data[i + 1] = old_word
+            keys[i] = key
+            data[i] = word
+        else:
+            if keys[i + 1] != 0 and keys[i + 1] != key:
+                self.overwrites += 1
+            keys[i + 1] = key
+            data[i + 1] = word
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'overwrites': self.overwrites}
+
+
+# ---------- instrumentation ----------
+class SearchStats:
+    """
+    Counters for one search. The per-phase timers (move generation,
+    legality tests, evaluation) are only filled in when the Searcher was
+    created with profile=True, since timing every call has a cost.
+    """
+    __slots__ = ('cutoffs', 'first_move_cutoffs', 'movegen_time', 'legality_time',
+                 'eval_time', 'tt_hits', 'tt_misses', 'tb_hits')
+
+    def __init__(self):
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.movegen_time = 0.0
+        self.legality_time = 0.0
+        self.eval_time = 0.0
+        self.tt_hits = 0
+        self.tt_misses = 0
+        self.tb_hits = 0
+
+
+class InfoLog:
+    """Search info callback that appends each update to a file as a JSON line."""
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, info):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(info) + '\n')
+
+
+class Searcher:
+    def __init__(self, tt_mb=16, profile=False, tablebases=None):
+        self.nodes = 0
+        self.profile = profile
+        self.tablebases = tablebases  # tablebase.Tablebases, or None
+        self.stats = SearchStats()
+        self.tt = TranspositionTable(tt_mb)
+        self.pv = []
+        self.deadline = None
+        self.node_limit = None
+        # an Event rather than a bool so worker processes can share one (see parallel.py)
+        self.stop_event = threading.Event()
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history = [0] * (120 * 120)
+
+    def stop(self):
+        """
+        Ask the running search (or, if none is running, the next one) to
+        return as soon as possible. Safe to call from another thread.
+        """
+        self.stop_event.set()
+
+    def check_limits(self):
+        """Raise SearchTimeout if the search has been stopped or ran out of time or nodes."""
+        if (self.stop_event.is_set()
+                or (self.deadline is not None and time.perf_counter() >= self.deadline)
+                or (self.node_limit is not None and self.nodes >= self.node_limit)):
+            raise SearchTimeout
+
+    def clear_heuristics(self):
+        """Reset killer slots and the history table before a new search."""
+        for slot in self.killers:
+            slot[0] = slot[1] = None
+        self.history = [0] * (120 * 120)
+
+    # ---------- iterative deepening ----------
+    def search(self, pos, max_depth, soft_time=None, hard_time=None, on_info=None, max_nodes=None):
+        """
+        Iterative deepening from depth 1 up to max_depth.
+
+        soft_time: seconds after which no new iteration is started.
+        hard_time: seconds after which the running iteration is abandoned.
+        on_info: called with the info() dict after every completed iteration.
+        max_nodes: node count after which the search stops (checked every
+        TIME_CHECK_INTERVAL nodes, so it may overshoot slightly).
+        Returns (best_value, best_move, depth) from the last completed
+        iteration; depth 1 always completes (unless stop() is called) so a
+        move is always returned when one exists.
+        """
+        start = time.perf_counter()
+        maximizing = pos.side == BLACK
+        self.nodes = 0
+        self.pv = []
+        self.stats = SearchStats()
+        tt_hits, tt_misses = self.tt.hits, self.tt.misses
+        self.tt.new_search()
+        self.clear_heuristics()
+        result = (None, None, 0)
+        tablebases = self.tablebases
+        try:
+            if tablebases is not None and pos.piece_count <= tablebases.max_pieces:
+                # the tables know the answer: no search needed
+                root = tablebases.best_move(pos)
+                if root is not None:
+                    move, hit = root
+                    val = tablebase_score(hit, 0, pos.side)
+                    self.stats.tb_hits += 1
+                    self.pv = [move]
+                    if on_info is not None:
+                        on_info(self.info(pos, 1, val, time.perf_counter() - start))
+                    return (val, move, 1)
+            for depth in range(1, max_depth + 1):
+                # the first iteration always runs to completion unless stopped
+                if depth > 1:
+                    self.deadline = start + hard_time if hard_time is not None else None
+                    self.node_limit = max_nodes
+                try:
+                    val, move = self.minimax(pos, depth, -math.inf, math.inf, maximizing)
+                except SearchTimeout:
+                    break
+                finally:
+                    self.deadline = None
+                    self.node_limit = None
+                result = (val, move, depth)
+                self.stats.tt_hits = self.tt.hits - tt_hits
+                self.stats.tt_misses = self.tt.misses - tt_misses
+                self.pv = self.principal_variation(pos, depth)
+                if on_info is not None:
+                    on_info(self.info(pos, depth, val, time.perf_counter() - start))
+                if move is None or abs(val) >= MATE_BOUND:
+                    break  # no moves, or a forced mate was found
+                if soft_time is not None and time.perf_counter() - start >= soft_time:
+                    break
+                if max_nodes is not None and self.nodes >= max_nodes:
+                    break
+        finally:
+            self.stop_event.clear()
+        return result
+
+    def info(self, pos, depth, score, elapsed):
+        """Snapshot of the search so far, as a JSON-friendly dict."""
+        stats = self.stats
+        probes = stats.tt_hits + stats.tt_misses
+        info = {
+            'depth': depth,
+            'score': score,
+            'nodes': self.nodes,
+            'nps': int(self.nodes / elapsed) if elapsed > 0 else 0,
+            'time_ms': int(elapsed * 1000),
+            'tt_hit_rate': round(stats.tt_hits / probes, 3) if probes else 0.0,
+            'tb_hits': stats.tb_hits,
+            'first_move_cutoff_rate': (round(stats.first_move_cutoffs / stats.cutoffs, 3)
+                                       if stats.cutoffs else 0.0),
+            'pv': [],
+        }
+        # render the PV by playing it out on the position
+        undos = []
+        for mv in self.pv:
+            info['pv'].append(pos.move_to_uci(mv))
+            undos.append(pos.make_move(mv))
+        for mv, undo in zip(reversed(self.pv), reversed(undos)):
+            pos.unmake_move(mv, undo)
+        if self.profile:
+            info['movegen_ms'] = int(stats.movegen_time * 1000)
+            info['legality_ms'] = int(stats.legality_time * 1000)
+            info['eval_ms'] = int(stats.eval_time * 1000)
+        return info
+
+    def principal_variation(self, pos, max_len):
+        """Follow best moves stored in the transposition table from pos."""
+        pv = []
+        undos = []
+        seen = set()
+        while len(pv) < max_len and pos.key not in seen:
+            seen.add(pos.key)
+            entry = self.tt.probe(pos.key)
+            if entry is None or entry[3] is None:
+                break
+            mv = entry[3]
+            if mv not in pos.legal_moves(pos.side):
+                break
+            pv.append(mv)
+            undos.append(pos.make_move(mv))
+        for mv, undo in zip(reversed(pv), reversed(undos)):
+            pos.unmake_move(mv, undo)
+        return pv
+
+    # ---------- move ordering ----------
+    def order_moves(self, pos, moves, tt_move, ply):
+        """
+        Sort moves best-first: previous PV move, table move, captures by
+        MVV-LVA (most valuable victim, least valuable attacker), the two
+        killer moves for this ply, then quiet moves by history score.
+        """
+        board = pos.board
+        pv_move = self.pv[ply] if ply < len(self.pv) else None
+        killer1, killer2 = self.killers[ply] if ply <= MAX_PLY else (None, None)
+        history = self.history
+        scored = []
+        for mv in moves:
+            if mv == pv_move:
+                score = ORDER_PV
+            elif mv == tt_move:
+                score = ORDER_TT
+            else:
+                frm, to, promo = mv
+                victim = board[to]
+                if victim != EMPTY or promo:
+                    score = ORDER_CAPTURE + ((victim & 7) + promo) * 8 - (board[frm] & 7)
+                elif mv == killer1:
+                    score = ORDER_KILLER + 1
+                elif mv == killer2:
+                    score = ORDER_KILLER
+                else:
+                    score = history[frm * 120 + to]
+            scored.append((score, mv))
+        scored.sort(reverse=True)
+        return [mv for _, mv in scored]
+
+    def record_cutoff(self, move, depth, ply):
+        """A quiet move caused a beta cutoff: remember it as a killer and in history."""
+        if ply <= MAX_PLY:
+            slot = self.killers[ply]
+            if slot[0] != move:
+                slot[1] = slot[0]
+                slot[0] = move
+        i = move[0] * 120 + move[1]
+        self.history[i] = min(self.history[i] + depth * depth, HISTORY_MAX)
+
+    # ---------- quiescence ----------
+    def quiescence(self, pos, alpha, beta, maximizing_player):
+        """
+        Search captures only until the position is quiet, so leaves are not
+        evaluated in the middle of an exchange. The side to move may also
+        "stand pat" on the static evaluation instead of capturing.
+        """
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0:
+            self.check_limits()
+
+        profile = self.profile
+        stats = self.stats
+        if profile:
+            t0 = time.perf_counter()
+        stand_pat = pos.evaluate()
+        if profile:
+            stats.eval_time += time.perf_counter() - t0
+        if maximizing_player:
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+        else:
+            if stand_pat <= alpha:
+                return stand_pat
+            beta = min(beta, stand_pat)
+
+        side = pos.side
+        board = pos.board
+        if profile:
+            t0 = time.perf_counter()
+        captures = pos.generate_captures(side)
+        if profile:
+            stats.movegen_time += time.perf_counter() - t0
+        scored = []
+        for mv in captures:
+            scored.append((((board[mv[1]] & 7) + mv[2]) * 8 - (board[mv[0]] & 7), mv))
+        scored.sort(reverse=True)
+
+        best = stand_pat
+        for _, mv in scored:
+            undo = pos.make_move(mv)
+            if profile:
+                t0 = time.perf_counter()
+                illegal = pos.in_check(side)
+                stats.legality_time += time.perf_counter() - t0
+            else:
+                illegal = pos.in_check(side)
+            if illegal:
+                pos.unmake_move(mv, undo)
+                continue
+            try:
+                val = self.quiescence(pos, alpha, beta, not maximizing_player)
+            finally:
+                pos.unmake_move(mv, undo)
+            if maximizing_player:
+                if val > best:
+                    best = val
+                alpha = max(alpha, val)
+            else:
+                if val < best:
+                    best = val
+                beta = min(beta, val)
+            if beta <= alpha:
+                break
+        return best
+
+    def minimax(self, pos, depth, alpha, beta, maximizing_player, ply=0):
+        """
+        Minimax with alpha-beta.
+        maximizing_player: True when it's Black's turn (AI), False for White (human).
+        Returns (best_value, best_move) where best_move is a move tuple or None.
+        """
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0:
+            self.check_limits()
+
+        # endgame tablebases: an exact result below the root, in O(1)
+        tablebases = self.tablebases
+        if ply and tablebases is not None and pos.piece_count <= tablebases.max_pieces:
+            hit = tablebases.probe(pos)
+            if hit is not None:
+                self.stats.tb_hits += 1
+                return (tablebase_score(hit, ply, pos.side), None)
+
+        profile = self.profile
+        stats = self.stats
+        side = pos.side
+        in_check = pos.in_check(side)
+
+        # leaf: extend by one ply when in check so mates on the horizon are
+        # seen, otherwise settle pending captures before evaluating
+        if depth <= 0:
+            if ply >= MAX_PLY:
+                return (pos.evaluate(), None)
+            if not in_check:
+                return (self.quiescence(pos, alpha, beta, maximizing_player), None)
+            depth = 1
+
+        # transposition table: reuse earlier work on this position
+        tt_move = None
+        entry = self.tt.probe(pos.key)
+        if entry is not None:
+            tt_depth, tt_score, tt_bound, tt_move = entry
+            tt_score = score_from_tt(tt_score, ply)
+            if tt_depth >= depth:
+                if tt_bound == EXACT:
+                    return (tt_score, tt_move)
+                if tt_bound == LOWER and tt_score >= beta:
+                    return (tt_score, tt_move)
+                if tt_bound == UPPER and tt_score <= alpha:
+                    return (tt_score, tt_move)
+
+        # generate moves once, for the side to move only; legality is
+        # checked after make_move so illegal moves cost one attack test
+        if profile:
+            t0 = time.perf_counter()
+        moves = pos.generate_moves(side)
+        if profile:
+            stats.movegen_time += time.perf_counter() - t0
+
+        moves = self.order_moves(pos, moves, tt_move, ply)
+        board = pos.board
+
+        alpha_orig, beta_orig = alpha, beta
+        best_move = None
+        best_eval = -math.inf if maximizing_player else math.inf
+        searched = 0
+        for mv in moves:
+            undo = pos.make_move(mv)
+            if profile:
+                t0 = time.perf_counter()
+                illegal = pos.in_check(side)
+                stats.legality_time += time.perf_counter() - t0
+            else:
+                illegal = pos.in_check(side)
+            if illegal:
+                pos.unmake_move(mv, undo)
+                continue
+            searched += 1
+            try:
+                val, _ = self.minimax(pos, depth-1, alpha, beta, not maximizing_player, ply+1)
+            finally:
+                pos.unmake_move(mv, undo)
+            if maximizing_player:
+                if val > best_eval:
+                    best_eval = val
+                    best_move = mv
+                alpha = max(alpha, val)
+            else:
+                if val < best_eval:
+                    best_eval = val
+                    best_move = mv
+                beta = min(beta, val)
+            if beta <= alpha:
+                stats.cutoffs += 1
+                if searched == 1:
+                    stats.first_move_cutoffs += 1
+                if board[mv[1]] == EMPTY and not mv[2]:
+                    self.record_cutoff(mv, depth, ply)
+                break
+
+        # no legal move: checkmate (scored by distance) or stalemate (draw)
+        if best_move is None:
+            if not in_check:
+                return (0, None)
+            mated = MATE_SCORE - ply
+            return (-mated if side == BLACK else mated, None)
+
+        if best_eval <= alpha_orig:
+            bound = UPPER
+        elif best_eval >= beta_orig:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.tt.store(pos.key, depth, score_to_tt(best_eval, ply), bound, best_move)
+        return (best_eval, best_move)
@@ -0,0 +1,555 @@
+"""
+Endgame tablebases: distance-to-mate tables for small material sets, built
+by retrograde analysis and probed in O(1).
+
+A table covers one material signature such as 'KQK' or 'KRKP' (White's
+pieces, then Black's); positions with the colors swapped are probed by
+mirroring the board. Each table is a packed array of one byte per
+position:
+
+    0       draw
+    1..254  plies to mate + 1: odd if the side to move is getting mated,
+            even if the side to move mates
+    255     not a position (illegal, or not the canonical form)
+
+The index is a perfect hash of the side to move and the piece squares.
+The first king is confined to a fundamental region of the board's
+symmetries (a1-d1-d4 without pawns, files a-d with pawns), which shrinks
+the tables 8- or 2-fold. Castling and en passant are not represented, and
+the fifty-move rule is ignored.
+
+    python tablebase.py generate [KQK KRK KPK ...] [--dir tablebases]
+    python tablebase.py probe [--fen FEN] [--dir tablebases]
+    python tablebase.py verify [KQK ...] [--dir tablebases]
+
+Three-piece tables take seconds to a minute; four-piece tables are much
+larger and take a long time in pure Python.
+"""
+import argparse
+import os
+import sys
+import time
+
+from engine import (Position, START_FEN, SQUARES, EMPTY, WHITE, BLACK, PAWN, KNIGHT, BISHOP,
+                    ROOK, QUEEN, KING, PAWN_STEP, PAWN_START_ROW, PROMOTION_ROW,
+                    SLIDER_OFFSETS, STEPPER_OFFSETS, row_col)
+
+LOSS, DRAW, WIN = -1, 0, 1
+
+ILLEGAL = 255
+MAX_DTM = 253  # longest distance to mate (in plies) that fits in a byte
+
+DEFAULT_DIR = 'tablebases'
+DEFAULT_SETS = ('KQK', 'KRK', 'KPK')
+
+_ORDER = 'KQRBNP'
+_TYPES = {'K': KING, 'Q': QUEEN, 'R': ROOK, 'B': BISHOP, 'N': KNIGHT, 'P': PAWN}
+_CHARS = {kind: ch for ch, kind in _TYPES.items()}
+
+# mailbox index -> 0..63 (GUI row-major, a8 first); SQUARES is the inverse
+SQ64 = [-1] * 120
+for _i, _sq in enumerate(SQUARES):
+    SQ64[_sq] = _i
+
+
+def _symmetry(flip_rows, flip_cols, transpose):
+    perm = []
+    for s in range(64):
+        r, c = divmod(s, 8)
+        if transpose:
+            r, c = c, r
+        if flip_rows:
+            r = 7 - r
+        if flip_cols:
+            c = 7 - c
+        perm.append(r * 8 + c)
+    return tuple(perm)
+
+
+# the 8 symmetries of the board, and the 2 that keep pawns moving the same way
+SYMMETRIES = tuple(_symmetry(fr, fc, t) for t in (0, 1) for fr in (0, 1) for fc in (0, 1))
+FILE_MIRRORS = (SYMMETRIES[0], _symmetry(0, 1, 0))
+
+# fundamental regions for the first king: a1-d1-d4 triangle, or files a-d
+_TRIANGLE = tuple(s for s in range(64) if 7 - s // 8 <= s % 8 <= 3)
+_HALF = tuple(s for s in range(64) if s % 8 <= 3)
+
+
+# ---------- material ----------
+def split_material(material):
+    """'KQKR' -> ('KQ', 'KR'), each side sorted K, Q, R, B, N, P."""
+    split = material.index('K', 1)
+    white, black = material[:split], material[split:]
+    for side in (white, black):
+        if side[0] != 'K' or 'K' in side[1:] or any(ch not in _ORDER for ch in side):
+            raise ValueError(f"bad material signature: {material!r}")
+    return ''.join(sorted(white, key=_ORDER.index)), ''.join(sorted(black, key=_ORDER.index))
+
+
+def insufficient(white, black):
+    """True if neither side can possibly mate: bare kings plus at most one minor piece."""
+    rest = white[1:] + black[1:]
+    return len(rest) <= 1 and all(ch in 'BN' for ch in rest)
+
+
+def submaterials(material):
+    """Materials reachable by one capture or one promotion."""
+    white, black = split_material(material)
+    result = set()
+    for i, ch in enumerate(white[1:], 1):
+        result.add(white[:i] + white[i + 1:] + black)
+    for i, ch in enumerate(black[1:], 1):
+        result.add(white + black[:i] + black[i + 1:])
+    for promo in 'QRBN':
+        if 'P' in white:
+            result.add(white.replace('P', promo, 1) + black)
+        if 'P' in black:
+            result.add(white + black.replace('P', promo, 1))
+    return {''.join(split_material(m)) for m in result}
+
+
+# ---------- one table ----------
+class Table:
+    """Index layout and data for one material signature."""
+    def __init__(self, material, data=None):
+        white, black = split_material(material)
+        self.material = white + black
+        self.white_count = len(white)
+        self.pieces = [_TYPES[ch] for ch in white] + [_TYPES[ch] | (BLACK << 3) for ch in black]
+        pawns = 'P' in self.material
+        self.symmetries = FILE_MIRRORS if pawns else SYMMETRIES
+        self.region = _HALF if pawns else _TRIANGLE
+        self.king_slot = [-1] * 64
+        for i, s in enumerate(self.region):
+            self.king_slot[s] = i
+        self.size = 2 * len(self.region) * 64 ** (len(self.pieces) - 1)
+        if data is not None and len(data) != self.size:
+            raise ValueError(f"{self.material}: expected {self.size} bytes, got {len(data)}")
+        self.data = data
+
+    def index(self, side, squares):
+        """
+        Canonical index for side to move and 0..63 squares given in
+        self.pieces order: the smallest over the symmetric images that put
+        the first king in the fundamental region.
+        """
+        best = -1
+        king_slot = self.king_slot
+        rest = squares[1:]
+        for perm in self.symmetries:
+            slot = king_slot[perm[squares[0]]]
+            if slot < 0:
+                continue
+            idx = side * len(self.region) + slot
+            for s in rest:
+                idx = idx * 64 + perm[s]
+            if best < 0 or idx < best:
+                best = idx
+        return best
+
+    def decode(self, idx):
+        """(side, squares) for an index."""
+        squares = []
+        for _ in range(len(self.pieces) - 1):
+            idx, s = divmod(idx, 64)
+            squares.append(s)
+        side, slot = divmod(idx, len(self.region))
+        squares.append(self.region[slot])
+        squares.reverse()
+        return side, squares
+
+    def path(self, directory):
+        return os.path.join(directory, self.material + '.tb')
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path(directory), 'wb') as f:
+            f.write(self.data)
+
+
+# ---------- probing ----------
+class Tablebases:
+    """All tables found in a directory (none if it does not exist)."""
+    def __init__(self, directory=None):
+        self.tables = {}
+        self.max_pieces = 3  # bare kings plus a minor are drawn without a table
+        if directory and os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith('.tb'):
+                    with open(os.path.join(directory, name), 'rb') as f:
+                        self.add(Table(name[:-3], f.read()))
+
+    def add(self, table):
+        self.tables[table.material] = table
+        self.max_pieces = max(self.max_pieces, len(table.pieces))
+
+    def has(self, material):
+        white, black = split_material(material)
+        return (insufficient(white, black) or white + black in self.tables
+                or black + white in self.tables)
+
+    def probe(self, pos):
+        """
+        (result, plies to mate) for the side to move, with result WIN, DRAW
+        or LOSS; (DRAW, 0) has no meaning for the distance. None if the
+        material has no table or en passant is possible.
+        """
+        board = pos.board
+        found = []
+        for sq in SQUARES:
+            piece = board[sq]
+            if piece != EMPTY:
+                found.append((piece >> 3, _ORDER.index(_CHARS[piece & 7]), sq))
+                if len(found) > self.max_pieces:
+                    return None
+        found.sort()
+        white = ''.join(_ORDER[o] for color, o, _ in found if color == WHITE)
+        black = ''.join(_ORDER[o] for color, o, _ in found if color == BLACK)
+        if insufficient(white, black):
+            return (DRAW, 0)
+        if pos.ep:
+            # a pawn of the side to move next to the double-stepped pawn
+            behind = pos.ep - PAWN_STEP[pos.side]
+            pawn = PAWN | (pos.side << 3)
+            if board[behind - 1] == pawn or board[behind + 1] == pawn:
+                return None
+
+        table = self.tables.get(white + black)
+        flip = 0
+        if table is None:
+            table = self.tables.get(black + white)
+            flip = 1
+            if table is None:
+                return None
+        # colors swapped: mirror the board top to bottom
+        mirror = 56 if flip else 0
+        squares = [SQ64[sq] ^ mirror for color, o, sq in sorted(found, key=lambda f: (f[0] ^ flip, f[1]))]
+        value = table.data[table.index(pos.side ^ flip, squares)]
+        if value == 0 or value == ILLEGAL:
+            return (DRAW, 0) if value == 0 else None
+        dtm = value - 1
+        return (WIN if dtm % 2 else LOSS, dtm)
+
+    def best_move(self, pos):
+        """
+        (move, (result, plies to mate)) for the best move in pos: the
+        quickest win, else a draw, else the slowest loss. None if pos has no
+        legal moves or any reply cannot be probed.
+        """
+        best = None
+        best_rank = None
+        for mv in pos.legal_moves(pos.side):
+            undo = pos.make_move(mv)
+            hit = self.probe(pos)
+            pos.unmake_move(mv, undo)
+            if hit is None:
+                return None
+            result, dtm = -hit[0], hit[1] + 1
+            rank = (result, -dtm if result == WIN else dtm)
+            if best_rank is None or rank > best_rank:
+                best, best_rank = (mv, (result, dtm if result else 0)), rank
+        return best
+
+
+# ---------- generation ----------
+def generate_table(material, tablebases, log=None):
+    """
+    Build the table for material by retrograde analysis. Captures and
+    promotions lead into smaller tables, which must already be in
+    tablebases (see generate()).
+    """
+    table = Table(material)
+    pieces = table.pieces
+    n = len(pieces)
+    kings = (0, table.white_count)
+    size = table.size
+    index = table.index
+    data = bytearray(size)
+    remaining = bytearray(size)  # distinct replies not yet known to win for the opponent
+    longest = bytearray(size)    # longest such opponent win seen so far
+    buckets = [[] for _ in range(MAX_DTM + 1)]  # positions to finish, by plies to mate
+    pos = Position()
+    board = pos.board
+    start = time.perf_counter()
+
+    def place(squares):
+        for piece, s in zip(pieces, squares):
+            board[SQUARES[s]] = piece
+        pos.kings = [SQUARES[squares[kings[0]]], SQUARES[squares[kings[1]]]]
+
+    def clear(squares):
+        for s in squares:
+            board[SQUARES[s]] = EMPTY
+
+    # pass 1: legal positions, mates, and the value of every reply that
+    # leaves the table
+    for idx in range(size):
+        side, squares = table.decode(idx)
+        if (len(set(squares)) < n or index(side, squares) != idx
+                or any(piece & 7 == PAWN and s // 8 in (0, 7) for piece, s in zip(pieces, squares))):
+            data[idx] = ILLEGAL
+            continue
+        place(squares)
+        pos.side = side
+        if pos.in_check(side ^ 1):
+            data[idx] = ILLEGAL
+            clear(squares)
+            continue
+        moves = pos.legal_moves(side)
+        if not moves:
+            if pos.in_check(side):
+                buckets[0].append(idx)  # checkmated
+            clear(squares)
+            continue  # otherwise stalemate: a draw
+
+        slot = {SQUARES[s]: i for i, s in enumerate(squares)}
+        children = set()
+        win = None
+        worst = 0
+        drawn = False
+        for mv in moves:
+            frm, to, promo = mv
+            if board[to] != EMPTY or promo:
+                undo = pos.make_move(mv)
+                hit = tablebases.probe(pos)
+                pos.unmake_move(mv, undo)
+                if hit is None:
+                    raise RuntimeError(f"{table.material}: no table for a position after a capture or promotion")
+                result, dtm = hit
+                if result == LOSS:
+                    win = dtm + 1 if win is None else min(win, dtm + 1)
+                elif result == WIN:
+                    worst = max(worst, dtm)
+                else:
+                    drawn = True
+            else:
+                child = list(squares)
+                child[slot[frm]] = SQ64[to]
+                children.add(index(side ^ 1, child))
+        clear(squares)
+
+        if win is not None and win <= MAX_DTM:
+            buckets[win].append(idx)
+        if drawn or win is not None:
+            remaining[idx] = 255  # can never be forced into a loss
+        else:
+            remaining[idx] = len(children)
+            longest[idx] = worst
+            if not children and win is None and worst < MAX_DTM:
+                buckets[worst + 1].append(idx)
+    if log:
+        log(f"{table.material}: scanned {size} positions in {time.perf_counter() - start:.1f}s")
+
+    # pass 2: walk back from finished positions, shortest mates first
+    for dtm in range(MAX_DTM + 1):
+        bucket = buckets[dtm]
+        buckets[dtm] = None
+        for idx in bucket:
+            if data[idx]:
+                continue
+            data[idx] = dtm + 1
+            for parent in _parents(table, idx, pos, place, clear):
+                if data[parent]:
+                    continue
+                if dtm % 2 == 0:
+                    # the side to move here is lost, so moving here wins
+                    if dtm < MAX_DTM:
+                        buckets[dtm + 1].append(parent)
+                else:
+                    remaining[parent] -= 1
+                    if longest[parent] < dtm:
+                        longest[parent] = dtm
+                    if remaining[parent] == 0 and dtm < MAX_DTM:
+                        buckets[longest[parent] + 1].append(parent)
+    table.data = bytes(data)
+    if log:
+        wins = sum(1 for v in data if v != ILLEGAL and v and v % 2 == 0)
+        log(f"{table.material}: done in {time.perf_counter() - start:.1f}s, "
+            f"{wins} won positions for the side to move")
+    return table
+
+
+def _parents(table, idx, pos, place, clear):
+    """
+    Distinct indices of the positions one quiet move before idx: the piece
+    the opponent just moved is stepped back to an empty square.
+    """
+    board = pos.board
+    side, squares = table.decode(idx)
+    mover = side ^ 1
+    place(squares)
+    king = pos.kings[side]
+    first = 0 if mover == WHITE else table.white_count
+    last = table.white_count if mover == WHITE else len(squares)
+    parents = set()
+    for i in range(first, last):
+        piece = table.pieces[i]
+        kind = piece & 7
+        sq = SQUARES[squares[i]]
+        origins = []
+        if kind == PAWN:
+            back = sq - PAWN_STEP[mover]
+            if board[back] == EMPTY and row_col(back)[0] != PROMOTION_ROW[mover ^ 1]:
+                origins.append(back)
+                back2 = back - PAWN_STEP[mover]
+                if row_col(back2)[0] == PAWN_START_ROW[mover] and board[back2] == EMPTY:
+                    origins.append(back2)
+        elif kind in SLIDER_OFFSETS:
+            for d in SLIDER_OFFSETS[kind]:
+                to = sq + d
+                while board[to] == EMPTY:
+                    origins.append(to)
+                    to += d
+        else:
+            for d in STEPPER_OFFSETS[kind]:
+                if board[sq + d] == EMPTY:
+                    origins.append(sq + d)
+
+        for origin in origins:
+            board[origin] = piece
+            board[sq] = EMPTY
+            # the side that did not move may not be left in check
+            if not pos.is_square_attacked(king, mover):
+                parent = list(squares)
+                parent[i] = SQ64[origin]
+                parents.add(table.index(mover, parent))
+            board[sq] = piece
+            board[origin] = EMPTY
+    clear(squares)
+    return parents
+
+
+def _best_child(pos, tablebases):
+    """
+    (result, plies to mate) for the side to move in pos, worked out from
+    the tablebase values of its legal moves; en passant is ignored, as in
+    the tables.
+    """
+    side = pos.side
+    moves = pos.legal_moves(side)
+    if not moves:
+        return (LOSS, 0) if pos.in_check(side) else (DRAW, 0)
+    win = loss = None
+    drawn = False
+    for mv in moves:
+        undo = pos.make_move(mv)
+        pos.ep = 0
+        hit = tablebases.probe(pos)
+        pos.unmake_move(mv, undo)
+        result, dtm = hit
+        if result == LOSS:
+            win = dtm + 1 if win is None else min(win, dtm + 1)
+        elif result == WIN:
+            loss = dtm + 1 if loss is None else max(loss, dtm + 1)
+        else:
+            drawn = True
+    if win is not None and win <= MAX_DTM:
+        return (WIN, win)
+    if drawn or win is not None or loss > MAX_DTM:
+        return (DRAW, 0)
+    return (LOSS, loss)
+
+
+def verify_table(table, tablebases, log=None):
+    """
+    Check that every position in table holds the best value over its legal
+    moves, one ply deep. table and every table it leads into must be in
+    tablebases. Returns the number of wrong positions.
+    """
+    pos = Position()
+    board = pos.board
+    kings = (0, table.white_count)
+    wrong = 0
+    start = time.perf_counter()
+    for idx in range(table.size):
+        if table.data[idx] == ILLEGAL:
+            continue
+        side, squares = table.decode(idx)
+        for piece, s in zip(table.pieces, squares):
+            board[SQUARES[s]] = piece
+        pos.kings = [SQUARES[squares[kings[0]]], SQUARES[squares[kings[1]]]]
+        pos.side = side
+        pos.ep = 0
+        stored = tablebases.probe(pos)
+        expected = _best_child(pos, tablebases)
+        if stored != expected:
+            wrong += 1
+            if log and wrong <= 5:
+                log(f"{table.material}: {pos.to_fen()} stored {stored}, moves give {expected}")
+        for s in squares:
+            board[SQUARES[s]] = EMPTY
+    if log:
+        log(f"{table.material}: verified in {time.perf_counter() - start:.1f}s, {wrong} wrong positions")
+    return wrong
+
+
+def generate(materials, directory=DEFAULT_DIR, log=print):
+    """
+    Generate, verify and save the tables for materials, along with every
+    smaller table they lead into. Tables already in directory are reused.
+    """
+    tablebases = Tablebases(directory)
+
+    def ensure(material):
+        if tablebases.has(material):
+            return
+        for sub in sorted(submaterials(material)):
+            ensure(sub)
+        table = generate_table(material, tablebases, log)
+        tablebases.add(table)
+        if verify_table(table, tablebases, log):
+            raise RuntimeError(f"{table.material}: generated table failed verification")
+        table.save(directory)
+
+    for material in materials:
+        ensure(''.join(split_material(material)))
+    return tablebases
+
+
+# ---------- command line ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate and probe endgame tablebases")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    g = sub.add_parser('generate', help="build tables (and the smaller ones they need)")
+    g.add_argument('materials', nargs='*', default=list(DEFAULT_SETS))
+    g.add_argument('--dir', default=DEFAULT_DIR)
+
+    v = sub.add_parser('verify', help="check saved tables against their moves, one ply deep")
+    v.add_argument('materials', nargs='*', help="default: every table in --dir")
+    v.add_argument('--dir', default=DEFAULT_DIR)
+
+    p = sub.add_parser('probe', help="look a position up")
+    p.add_argument('--fen', default=START_FEN)
+    p.add_argument('--dir', default=DEFAULT_DIR)
+
+    args = parser.parse_args(argv)
+    if args.command == 'generate':
+        generate(args.materials, args.dir)
+    elif args.command == 'verify':
+        tablebases = Tablebases(args.dir)
+        materials = [''.join(split_material(m)) for m in args.materials] or sorted(tablebases.tables)
+        wrong = 0
+        for material in materials:
+            if material not in tablebases.tables:
+                print(f"{material}: no table in {args.dir}")
+                return 1
+            wrong += verify_table(tablebases.tables[material], tablebases, print)
+        return 1 if wrong else 0
+    else:
+        pos = Position.from_fen(args.fen)
+        tablebases = Tablebases(args.dir)
+        hit = tablebases.probe(pos)
+        if hit is None:
+            print("not in the tablebases")
+            return 1
+        result, dtm = hit
+        print({WIN: f"win, mate in {dtm} plies", DRAW: "draw", LOSS: f"loss, mated in {dtm} plies"}[result])
+        best = tablebases.best_move(pos)
+        if best is not None:
+            print(f"best move {pos.move_to_san(best[0])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
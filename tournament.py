@@ -0,0 +1,344 @@
+"""
+Headless engine-vs-engine matches, to check that a change makes the engine
+stronger and not just faster.
+
+    python tournament.py --a depth=4 --b depth=3 [--games N] [--workers N]
+                         [--openings FILE] [--pgn match.pgn]
+                         [--elo0 0] [--elo1 10]
+
+An engine configuration is a comma-separated list of key=value settings:
+depth, nodes, movetime (seconds per move), time and inc (a clock in
+seconds, managed with allocate_time as in the GUI), hash (MB),
+tablebases (directory) and eval (a parameter file written by tune.py, or
+'builtin' for the hand-set values; by default whatever evaluation.py
+loaded at startup), plus an optional name. Games start from a set of
+opening positions, each played twice with colors swapped, and run
+concurrently on a process pool. Every game is written to the PGN file and
+the match is summarised as W/D/L, an Elo difference with a 95% error
+margin, and a sequential probability ratio test (SPRT) of elo0 against
+elo1.
+"""
+import argparse
+import math
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import evaluation
+from engine import Position, GameState, START_FEN, eval_tables, set_eval_tables
+from search import Searcher, MAX_PLY, allocate_time
+from tablebase import Tablebases
+from book import pgn_games
+from pgn import write_game
+from analyze import parse_epd
+
+MAX_GAME_PLIES = 400  # adjudicated as a draw after this many plies
+
+# balanced positions a few moves into common openings
+DEFAULT_OPENINGS = [
+    START_FEN,
+    'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2',            # 1.e4 e5
+    'rnbqkbnr/pp1ppppp/8/2p5/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2',            # Sicilian
+    'rnbqkbnr/pppp1ppp/4p3/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2',            # French
+    'rnbqkbnr/pp1ppppp/2p5/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2',            # Caro-Kann
+    'rnbqkbnr/ppp1pppp/8/3p4/3P4/8/PPP1PPPP/RNBQKBNR w KQkq - 0 2',            # 1.d4 d5
+    'rnbqkb1r/pppppppp/5n2/8/3P4/8/PPP1PPPP/RNBQKBNR w KQkq - 1 2',            # 1.d4 Nf6
+    'rnbqkbnr/pppppppp/8/8/2P5/8/PP1PPPPP/RNBQKBNR b KQkq - 0 1',              # English
+    'r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3',       # Ruy Lopez
+    'r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3',       # Italian
+    'rnbqkb1r/ppp1pppp/5n2/3p4/2PP4/8/PP2PPPP/RNBQKBNR w KQkq - 1 3',          # Queen's Gambit
+    'rnbqkb1r/pppppp1p/5np1/8/2PP4/8/PP2PPPP/RNBQKBNR w KQkq - 0 3',           # King's Indian
+]
+
+
+class EngineConfig:
+    """Search settings for one side of a match."""
+    __slots__ = ('name', 'depth', 'nodes', 'movetime', 'time', 'inc', 'hash', 'tablebases', 'eval')
+
+    def __init__(self, name='engine', depth=MAX_PLY, nodes=None, movetime=None,
+                 time=None, inc=0.0, hash=16, tablebases=None, eval=None):
+        self.name = name
+        self.depth = depth
+        self.nodes = nodes
+        self.movetime = movetime
+        self.time = time
+        self.inc = inc
+        self.hash = hash
+        self.tablebases = tablebases
+        self.eval = eval
+
+    @classmethod
+    def parse(cls, text, name):
+        """EngineConfig from 'depth=4,movetime=0.5,...'; name is used unless given."""
+        types = {'name': str, 'depth': int, 'nodes': int, 'movetime': float,
+                 'time': float, 'inc': float, 'hash': int, 'tablebases': str, 'eval': str}
+        settings = {'name': name}
+        for item in filter(None, text.split(',')):
+            key, sep, value = item.partition('=')
+            key = key.strip()
+            if not sep or key not in types:
+                raise ValueError(f"bad engine setting {item!r} (expected one of {', '.join(types)})")
+            settings[key] = types[key](value.strip())
+        if not any(key in settings for key in ('depth', 'nodes', 'movetime', 'time')):
+            raise ValueError(f"{text!r} sets no depth, nodes or time limit")
+        return cls(**settings)
+
+    def __repr__(self):
+        limits = [f'{key}={getattr(self, key)}' for key in ('depth', 'nodes', 'movetime', 'time', 'inc')
+                  if getattr(self, key) not in (None, 0.0, MAX_PLY)]
+        if self.eval is not None:
+            limits.append(f'eval={self.eval}')
+        return f"{self.name}({', '.join(limits)})"
+
+
+    def eval_params(self):
+        """Evaluation parameters for eval_tables(), or None for those loaded at startup."""
+        if self.eval is None:
+            return None
+        if self.eval == 'builtin':
+            return evaluation.BUILTIN
+        return evaluation.read_params(self.eval)
+
+
+# ---------- one game ----------
+def play_game(white, black, fen, max_plies=MAX_GAME_PLIES):
+    """
+    Play one game between two EngineConfigs from fen. Returns (result,
+    termination, sans) with result '1-0', '0-1' or '1/2-1/2'. The rules
+    (mate, stalemate, repetition, fifty moves, insufficient material)
+    come from engine.GameState, as in the GUI.
+
+    Each side searches with its own evaluation tables, swapped into the
+    engine before its move; the tables in use are restored afterwards.
+    """
+    configs = (white, black)
+    searchers = [Searcher(tt_mb=cfg.hash,
+                          tablebases=Tablebases(cfg.tablebases) if cfg.tablebases else None)
+                 for cfg in configs]
+    default = eval_tables()
+    tables = [eval_tables(cfg.eval_params()) for cfg in configs]
+    try:
+        return _play_moves(configs, searchers, tables, fen, max_plies)
+    finally:
+        set_eval_tables(default)
+
+
+def _play_moves(configs, searchers, tables, fen, max_plies):
+    clocks = [cfg.time for cfg in configs]
+    pos = Position.from_fen(fen)
+    seen = {pos.key: 1}
+    sans = []
+    wins = ('1-0', '0-1')
+    while True:
+        state = GameState(pos)
+        if state.is_checkmate:
+            return wins[pos.side ^ 1], 'checkmate', sans
+        if state.is_stalemate:
+            return '1/2-1/2', 'stalemate', sans
+        if state.insufficient_material:
+            return '1/2-1/2', 'insufficient material', sans
+        if state.fifty_moves:
+            return '1/2-1/2', 'fifty-move rule', sans
+        if seen[pos.key] >= 3:
+            return '1/2-1/2', 'repetition', sans
+        if len(sans) >= max_plies:
+            return '1/2-1/2', 'move limit', sans
+
+        side = pos.side
+        cfg = configs[side]
+        if clocks[side] is not None:
+            soft, hard = allocate_time(clocks[side], pos.fullmove)
+        else:
+            soft = hard = cfg.movetime
+        set_eval_tables(tables[side])
+        pos.refresh()  # running evaluation totals for this side's tables
+        start = time.perf_counter()
+        _, move, _ = searchers[side].search(pos, cfg.depth, soft_time=soft, hard_time=hard,
+                                            max_nodes=cfg.nodes)
+        if clocks[side] is not None:
+            clocks[side] -= time.perf_counter() - start
+            if clocks[side] < 0:
+                return wins[side ^ 1], 'time forfeit', sans
+            clocks[side] += cfg.inc
+        if move is None or move not in state:
+            move = state.moves[0]  # cannot happen with a working search; keep the game legal
+
+        sans.append(pos.move_to_san(move, state.moves))
+        pos.make_move(move)
+        seen[pos.key] = seen.get(pos.key, 0) + 1
+
+
+def _play(index, a, b, fen, max_plies):
+    """Worker task: game `index`, with engine A as White on even indexes."""
+    white, black = (a, b) if index % 2 == 0 else (b, a)
+    result, termination, sans = play_game(white, black, fen, max_plies)
+    return index, fen, white.name, black.name, result, termination, sans
+
+
+# ---------- statistics ----------
+def elo_estimate(wins, draws, losses):
+    """
+    (Elo difference, 95% margin) for a W/D/L record; infinite for a
+    shutout. The margin is NaN (unknown) when the results do not vary,
+    as in an all-draw match.
+    """
+    n = wins + draws + losses
+    if n == 0:
+        return 0.0, math.nan
+    score = (wins + 0.5 * draws) / n
+    if score <= 0 or score >= 1:
+        return (math.inf if score >= 1 else -math.inf), math.inf
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    margin_score = 1.96 * math.sqrt(variance / n)
+
+    def elo(s):
+        s = min(max(s, 1e-9), 1 - 1e-9)
+        return -400 * math.log10(1 / s - 1) + 0.0  # + 0.0: no "-0.0" for an even score
+    if variance == 0:
+        return elo(score), math.nan
+    return elo(score), (elo(score + margin_score) - elo(score - margin_score)) / 2
+
+
+def sprt(wins, draws, losses, elo0=0.0, elo1=10.0, alpha=0.05, beta=0.05):
+    """
+    Log-likelihood ratio of H1 (elo1) against H0 (elo0) for a W/D/L record,
+    with its (lower, upper) acceptance bounds, using the normal
+    approximation to the trinomial (GSPRT) as in common engine testing.
+    """
+    lower, upper = math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+    n = wins + draws + losses
+    if n == 0:
+        return 0.0, lower, upper
+    score = (wins + 0.5 * draws) / n
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    if variance == 0:
+        return 0.0, lower, upper
+    s0 = 1 / (1 + 10 ** (-elo0 / 400))
+    s1 = 1 / (1 + 10 ** (-elo1 / 400))
+    llr = n * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+    return llr, lower, upper
+
+
+def summary(a, b, wins, draws, losses, elo0, elo1):
+    """Lines describing the match from engine A's point of view."""
+    elo, margin = elo_estimate(wins, draws, losses)
+    llr, lower, upper = sprt(wins, draws, losses, elo0, elo1)
+    if llr >= upper:
+        verdict = f"H1 accepted: {a.name} is at least {elo1:g} Elo stronger"
+    elif llr <= lower:
+        verdict = f"H0 accepted: {a.name} is not {elo1:g} Elo stronger"
+    else:
+        verdict = "inconclusive, play more games"
+    n = wins + draws + losses
+    return [
+        f"{a!r} vs {b!r}",
+        f"games {n}: +{wins} ={draws} -{losses}, score {(wins + 0.5 * draws) / n:.3f}" if n else "no games",
+        f"Elo {elo:+.1f} +/- {margin:.1f}" if math.isfinite(margin) else f"Elo {elo:+.1f} +/- ?",
+        f"SPRT [{elo0:g}, {elo1:g}]: LLR {llr:.2f} ({lower:.2f}, {upper:.2f}) {verdict}",
+    ]
+
+
+# ---------- openings ----------
+def load_openings(path, plies=8):
+    """
+    Start positions from a file: one FEN or EPD per line, or a PGN file,
+    in which case the position after `plies` plies of every game is used.
+    """
+    if path.endswith('.pgn'):
+        fens = []
+        for start, moves, _ in pgn_games([path]):
+            pos = start.copy()
+            for mv in moves[:plies]:
+                pos.make_move(mv)
+            fens.append(pos.to_fen())
+        return fens
+    fens = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                fens.append(parse_epd(line)[0])
+            except ValueError:
+                continue  # blank, comment or malformed line
+    return fens
+
+
+# ---------- match ----------
+def run_match(a, b, games, openings, workers=None, pgn_path=None, max_plies=MAX_GAME_PLIES,
+              log=print):
+    """
+    Play `games` games between EngineConfigs a and b on a process pool.
+    Returns A's (wins, draws, losses).
+    """
+    wins = draws = losses = 0
+    date = time.strftime('%Y.%m.%d')
+    out = open(pgn_path, 'w', encoding='utf-8') if pgn_path else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_play, i, a, b, openings[(i // 2) % len(openings)], max_plies)
+                       for i in range(games)]
+            for done, future in enumerate(as_completed(futures), 1):
+                index, fen, white, black, result, termination, sans = future.result()
+                if result == '1/2-1/2':
+                    draws += 1
+                elif (result == '1-0') == (white == a.name):
+                    wins += 1
+                else:
+                    losses += 1
+                log(f"game {index + 1:>3}: {white} - {black} {result} ({termination}, "
+                    f"{len(sans)} plies)  [{done}/{games}] +{wins} ={draws} -{losses}")
+                if out is not None:
+                    headers = {'Event': f'{a.name} vs {b.name}', 'Site': 'tournament.py',
+                               'Date': date, 'Round': str(index + 1), 'White': white,
+                               'Black': black, 'Result': result, 'Termination': termination}
+                    if fen != START_FEN:
+                        headers['SetUp'] = '1'
+                        headers['FEN'] = fen
+                    write_game(out, headers, Position.from_fen(fen), sans)
+                    out.flush()
+    finally:
+        if out is not None:
+            out.close()
+    return wins, draws, losses
+
+
+# ---------- command line ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play an engine-vs-engine match")
+    parser.add_argument('--a', default='depth=4', help="engine A settings, e.g. depth=4,hash=16")
+    parser.add_argument('--b', default='depth=3', help="engine B settings")
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument('--openings', default=None, help="FEN/EPD or PGN file of start positions")
+    parser.add_argument('--pgn', default='match.pgn', help="where to write the games")
+    parser.add_argument('--max-plies', type=int, default=MAX_GAME_PLIES)
+    parser.add_argument('--elo0', type=float, default=0.0)
+    parser.add_argument('--elo1', type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    try:
+        a = EngineConfig.parse(args.a, 'A')
+        b = EngineConfig.parse(args.b, 'B')
+    except ValueError as e:
+        parser.error(str(e))
+    if a.name == b.name:
+        parser.error("the two engines need different names")
+    for cfg in (a, b):
+        try:
+            cfg.eval_params()  # a bad file should fail here, not in every game
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            parser.error(f"eval={cfg.eval}: {e}")
+    openings = load_openings(args.openings) if args.openings else DEFAULT_OPENINGS
+    if not openings:
+        parser.error(f"no positions in {args.openings}")
+
+    start = time.perf_counter()
+    wins, draws, losses = run_match(a, b, args.games, openings, args.workers, args.pgn,
+                                    args.max_plies)
+    for line in summary(a, b, wins, draws, losses, args.elo0, args.elo1):
+        print(line)
+    print(f"{time.perf_counter() - start:.1f}s, games written to {args.pgn}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
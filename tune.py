@@ -0,0 +1,259 @@
+"""
+Texel-style tuning of the evaluation parameters against game results.
+
+    python tune.py positions.epd [more files ...] [--limit N] [--epochs N]
+                   [--batch N] [--lr X] [-o eval_params.json]
+
+Input is labelled positions: EPD/FEN lines with the result as a c9 or
+result operation ('c9 "1-0";') or a trailing '[1.0]' / '[0.5]' / '[0.0]',
+or PGN files, whose positions (after the first --skip plies, and not in
+check) are labelled with the game's result. Results are from White's
+point of view.
+
+Each position becomes a row of up to 32 (feature index, sign) pairs, one
+per piece, where the feature is the piece type and its square seen from
+its own side, plus the game phase. The evaluation is linear in the
+per-(type, square) values, value[type] + pst[type][square], so the whole
+dataset is scored with one gather and a row sum per phase, and the
+gradient of the mean squared error of sigmoid(eval) against the results
+is collected with one bincount per phase. Parameters are fitted with
+mini-batch Adam after the sigmoid scale K has been fitted to the current
+values. The result is split back into material values and piece-square
+tables and written where evaluation.py loads it at startup.
+
+Requires numpy, which nothing else in the engine uses.
+"""
+import argparse
+import math
+import sys
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # reported by main(); the engine itself never needs numpy
+    np = None
+
+import evaluation
+from engine import Position, SQUARES, EMPTY, WHITE, PAWN, KING
+from analyze import parse_epd
+from book import pgn_games
+
+FEATURES = 6 * 64   # (piece type, square from its own side)
+PAD = FEATURES      # index of an always-zero weight, for rows with fewer than 32 pieces
+MAX_PIECES = 32
+RESULTS = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5}
+
+
+# ---------- loading ----------
+def _epd_result(line):
+    """(fen, White's score) for a labelled EPD/FEN line, or None if it has no label."""
+    text, _, bracket = line.partition('[')
+    fen, ops = parse_epd(text)
+    if bracket:
+        return fen, float(bracket.split(']')[0])
+    for op in ('c9', 'result'):
+        if op in ops and ops[op] and ops[op][0] in RESULTS:
+            return fen, RESULTS[ops[op][0]]
+    return None
+
+
+def labelled_positions(paths, skip=8):
+    """Yield (Position, White's score) from EPD/FEN and PGN files."""
+    for path in paths:
+        if path.endswith('.pgn'):
+            for start, moves, result in pgn_games([path]):
+                if result not in RESULTS:
+                    continue
+                pos = start.copy()
+                for ply, mv in enumerate(moves):
+                    pos.make_move(mv)
+                    if ply + 1 >= skip and not pos.in_check(pos.side):
+                        yield pos.copy(), RESULTS[result]
+            continue
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                try:
+                    labelled = _epd_result(line)
+                    if labelled is not None:
+                        yield Position.from_fen(labelled[0]), labelled[1]
+                except (ValueError, IndexError, KeyError):
+                    continue  # malformed line
+
+
+def load_dataset(positions, limit=None):
+    """
+    Feature arrays for an iterable of (Position, score):
+    idx (n, 32) int16 feature indices, sign (n, 32) int8 (+1 White,
+    -1 Black, 0 padding), phase (n,) middlegame weight in [0, 1] and
+    y (n,) results.
+    """
+    idx = array('h')
+    sign = array('b')
+    phase = array('d')
+    y = array('d')
+    n = 0
+    for pos, result in positions:
+        board = pos.board
+        count = 0
+        total_phase = 0
+        for i, sq in enumerate(SQUARES):
+            piece = board[sq]
+            if piece == EMPTY:
+                continue
+            kind = piece & 7
+            if piece >> 3 == WHITE:
+                idx.append((kind - 1) * 64 + i)
+                sign.append(1)
+            else:
+                idx.append((kind - 1) * 64 + (i ^ 56))  # mirrored, as engine.build_eval_tables
+                sign.append(-1)
+            total_phase += evaluation.PHASE_WEIGHTS[kind]
+            count += 1
+        for _ in range(MAX_PIECES - count):
+            idx.append(PAD)
+            sign.append(0)
+        phase.append(min(total_phase, evaluation.MAX_PHASE) / evaluation.MAX_PHASE)
+        y.append(result)
+        n += 1
+        if limit is not None and n >= limit:
+            break
+    return (np.frombuffer(idx, dtype=np.int16).reshape(n, MAX_PIECES).astype(np.intp),
+            np.frombuffer(sign, dtype=np.int8).reshape(n, MAX_PIECES).astype(np.float64),
+            np.frombuffer(phase, dtype=np.float64), np.frombuffer(y, dtype=np.float64))
+
+
+# ---------- model ----------
+def current_weights():
+    """(2, FEATURES + 1) middlegame and endgame weights from evaluation.py."""
+    weights = np.zeros((2, FEATURES + 1))
+    for kind in range(PAWN, KING + 1):
+        base = (kind - 1) * 64
+        weights[0, base:base + 64] = evaluation.MG_VALUES[kind] + np.array(evaluation.PST_MG[kind])
+        weights[1, base:base + 64] = evaluation.EG_VALUES[kind] + np.array(evaluation.PST_EG[kind])
+    return weights
+
+
+def evaluate(weights, idx, sign, phase):
+    """Evaluation from White's point of view for every row, in centipawns."""
+    mg = (weights[0][idx] * sign).sum(axis=1)
+    eg = (weights[1][idx] * sign).sum(axis=1)
+    return mg * phase + eg * (1 - phase)
+
+
+def _sigmoid(evals, k):
+    return 1 / (1 + np.power(10.0, -k * evals / 400))
+
+
+def loss(weights, k, idx, sign, phase, y):
+    return float(np.mean((y - _sigmoid(evaluate(weights, idx, sign, phase), k)) ** 2))
+
+
+def gradient(weights, k, idx, sign, phase, y):
+    """d(loss)/d(weights) over the given rows, by bincount over feature indices."""
+    s = _sigmoid(evaluate(weights, idx, sign, phase), k)
+    g = -2 * (y - s) * s * (1 - s) * (k * math.log(10) / 400) / len(y)
+    flat = idx.ravel()
+    grad = np.empty_like(weights)
+    grad[0] = np.bincount(flat, weights=(sign * (g * phase)[:, None]).ravel(), minlength=FEATURES + 1)
+    grad[1] = np.bincount(flat, weights=(sign * (g * (1 - phase))[:, None]).ravel(), minlength=FEATURES + 1)
+    grad[:, PAD] = 0
+    return grad
+
+
+def fit_k(weights, idx, sign, phase, y, lo=0.1, hi=4.0, steps=40):
+    """The sigmoid scale minimising the loss for fixed weights (golden-section search)."""
+    ratio = (math.sqrt(5) - 1) / 2
+    a, b = lo, hi
+    for _ in range(steps):
+        c = b - ratio * (b - a)
+        d = a + ratio * (b - a)
+        if loss(weights, c, idx, sign, phase, y) < loss(weights, d, idx, sign, phase, y):
+            b = d
+        else:
+            a = c
+    return (a + b) / 2
+
+
+def tune(weights, k, idx, sign, phase, y, epochs=20, batch=16384, lr=2.0, seed=0, log=print):
+    """Mini-batch Adam over the dataset; returns the fitted weights."""
+    weights = weights.copy()
+    m = np.zeros_like(weights)
+    v = np.zeros_like(weights)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    rng = np.random.default_rng(seed)
+    n = len(y)
+    t = 0
+    for epoch in range(1, epochs + 1):
+        start = time.perf_counter()
+        order = rng.permutation(n)
+        for lo in range(0, n, batch):
+            rows = order[lo:lo + batch]
+            grad = gradient(weights, k, idx[rows], sign[rows], phase[rows], y[rows])
+            t += 1
+            m = beta1 * m + (1 - beta1) * grad
+            v = beta2 * v + (1 - beta2) * grad * grad
+            weights -= lr * (m / (1 - beta1 ** t)) / (np.sqrt(v / (1 - beta2 ** t)) + eps)
+        log(f"epoch {epoch:>3}: loss {loss(weights, k, idx, sign, phase, y):.6f} "
+            f"({time.perf_counter() - start:.1f}s)")
+    return weights
+
+
+def split_weights(weights):
+    """
+    (mg_values, eg_values, pst_mg, pst_eg) in evaluation.py's layout: each
+    type's value is its mean weight over the squares it can stand on, and
+    the table holds the rest. Kings keep a value of 0 (both sides always
+    have one, so it cancels out).
+    """
+    values = [[0] * 7, [0] * 7]
+    tables = [[], []]
+    for phase in (0, 1):
+        for kind in range(PAWN, KING + 1):
+            w = weights[phase, (kind - 1) * 64:kind * 64]
+            squares = slice(8, 56) if kind == PAWN else slice(0, 64)
+            value = 0 if kind == KING else int(round(w[squares].mean()))
+            table = np.rint(w - value).astype(int)
+            if kind == PAWN:
+                table[:8] = 0
+                table[56:] = 0
+            values[phase][kind] = value
+            tables[phase].append(table.tolist())
+    return values[0], values[1], tables[0], tables[1]
+
+
+# ---------- command line ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune evaluation parameters on labelled positions")
+    parser.add_argument('inputs', nargs='+', help="EPD/FEN files with results, or PGN files")
+    parser.add_argument('-o', '--output', default=evaluation.TUNED_PATH)
+    parser.add_argument('--limit', type=int, default=None, help="use at most N positions")
+    parser.add_argument('--skip', type=int, default=8, help="opening plies skipped in PGN games")
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch', type=int, default=16384)
+    parser.add_argument('--lr', type=float, default=2.0, help="Adam step size in centipawns")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if np is None:
+        parser.error("tune.py needs numpy: pip install numpy")
+
+    start = time.perf_counter()
+    idx, sign, phase, y = load_dataset(labelled_positions(args.inputs, args.skip), args.limit)
+    if not len(y):
+        parser.error("no labelled positions found")
+    print(f"{len(y)} positions loaded in {time.perf_counter() - start:.1f}s")
+
+    weights = current_weights()
+    k = fit_k(weights, idx, sign, phase, y)
+    print(f"K = {k:.3f}, initial loss {loss(weights, k, idx, sign, phase, y):.6f}")
+    weights = tune(weights, k, idx, sign, phase, y, args.epochs, args.batch, args.lr, args.seed)
+
+    evaluation.save_params(args.output, *split_weights(weights))
+    print(f"parameters written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
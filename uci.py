@@ -0,0 +1,241 @@
+"""
+UCI (Universal Chess Interface) front end, so the engine can be driven by
+standard chess GUIs, match runners and scripts without tkinter.
+
+    python uci.py            (or: python main.py --uci)
+
+Supported commands: uci, isready, setoption (Hash, Threads, TablebasePath),
+ucinewgame, position [startpos | fen FEN] [moves ...], go [depth N]
+[movetime MS] [wtime MS] [btime MS] [winc MS] [binc MS] [nodes N]
+[infinite] [ponder], stop, ponderhit, quit. Searches run on the
+api.Engine thread, so stop is answered while a search is in progress;
+every go is answered with exactly one bestmove. After go infinite or go
+ponder the bestmove is held back, even if the search ends by itself,
+until stop (or ponderhit, or quit) arrives, as the protocol requires.
+"""
+import sys
+import threading
+
+from engine import Position, BLACK
+from search import MATE_SCORE, MATE_BOUND, MAX_PLY
+from api import Engine, SearchLimits
+
+ENGINE_NAME = "Python-Chess-AI"
+ENGINE_AUTHOR = "Vaishali Murugesan"
+
+
+def uci_score(score, side):
+    """UCI score string for a search score (Black's point of view) with side to move."""
+    if side != BLACK:
+        score = -score
+    if abs(score) >= MATE_BOUND:
+        plies = MATE_SCORE - abs(score)
+        moves = (plies + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {score}"
+
+
+class _Go:
+    """Bookkeeping for one go command: whether its bestmove must wait, and the held line."""
+    __slots__ = ('wait', 'bestmove')
+
+    def __init__(self, wait):
+        self.wait = wait
+        self.bestmove = None
+
+
+class UCI:
+    """One UCI session reading commands with handle() and writing to out."""
+    def __init__(self, out=sys.stdout, tt_mb=16, workers=1, tablebase_dir=None):
+        self.out = out
+        self.tt_mb = tt_mb
+        self.workers = workers
+        self.tablebase_dir = tablebase_dir
+        self.engine = None
+        self.position = Position.start()
+        self._out_lock = threading.Lock()
+        self._go_lock = threading.Lock()
+        self._go = None  # _Go for the latest go command
+
+    def send(self, line):
+        # called from the engine thread as well as the reading thread
+        with self._out_lock:
+            self.out.write(line + '\n')
+            self.out.flush()
+
+    def _engine(self):
+        if self.engine is None:
+            self.engine = Engine(tt_mb=self.tt_mb, workers=self.workers,
+                                 tablebase_dir=self.tablebase_dir)
+        return self.engine
+
+    def close(self):
+        """Stop searching and release the engine; it is rebuilt on next use."""
+        if self.engine is not None:
+            self.engine.shutdown()
+            self.engine = None
+
+    def handle(self, line):
+        """Process one command line. Returns False once the session should end."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {self.tt_mb} min 1 max 1024")
+            self.send(f"option name Threads type spin default {self.workers} min 1 max 64")
+            self.send(f"option name TablebasePath type string default {self.tablebase_dir or '<empty>'}")
+            self.send("uciok")
+        elif command == 'isready':
+            self._engine()
+            self.send("readyok")
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'ucinewgame':
+            self.position = Position.start()
+        elif command == 'position':
+            self.set_position(args)
+        elif command == 'go':
+            self.go(args)
+        elif command == 'stop':
+            self.release_bestmove()
+            if self.engine is not None:
+                self.engine.stop()
+        elif command == 'ponderhit':
+            # the pondered move was played: the search goes on under its limits
+            self.release_bestmove()
+        elif command == 'quit':
+            self.release_bestmove()
+            self.close()
+            return False
+        # anything else (debug, register, ...) is ignored, as the protocol asks
+        return True
+
+    def set_option(self, args):
+        """setoption name <id> [value <x>]"""
+        text = ' '.join(args)
+        if not text.startswith('name '):
+            return
+        name, _, value = text[5:].partition(' value ')
+        name = name.strip().lower()
+        value = value.strip()
+        try:
+            if name == 'hash':
+                self.tt_mb = max(1, int(value))
+            elif name == 'threads':
+                self.workers = max(1, int(value))
+            elif name == 'tablebasepath':
+                self.tablebase_dir = value if value and value != '<empty>' else None
+            else:
+                return
+        except ValueError:
+            return
+        self.close()  # picks up the new settings when next used
+
+    def set_position(self, args):
+        """position [startpos | fen <fen>] [moves <uci> ...]"""
+        if 'moves' in args:
+            i = args.index('moves')
+            args, moves = args[:i], args[i + 1:]
+        else:
+            moves = []
+        if args and args[0] == 'fen':
+            try:
+                pos = Position.from_fen(' '.join(args[1:]))
+            except (ValueError, IndexError, KeyError):
+                return  # keep the previous position on a malformed FEN
+        else:
+            pos = Position.start()
+        for text in moves:
+            mv = pos.parse_uci_move(text)
+            if mv is None:
+                break
+            pos.make_move(mv)
+        self.position = pos
+
+    def limits(self, args):
+        """SearchLimits for the arguments of a go command."""
+        values = {}
+        i = 0
+        while i < len(args):
+            key = args[i]
+            if key in ('depth', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'nodes', 'movestogo'):
+                try:
+                    values[key] = int(args[i + 1])
+                except (IndexError, ValueError):
+                    pass
+                i += 2
+            else:
+                i += 1  # infinite, ponder, searchmoves ... run until stop
+        depth = max(1, min(values.get('depth', MAX_PLY), MAX_PLY))
+        pos = self.position
+        clock, inc = ('btime', 'binc') if pos.side == BLACK else ('wtime', 'winc')
+        if 'movetime' in values:
+            seconds = values['movetime'] / 1000
+            limits = SearchLimits(depth=depth, soft_time=seconds, hard_time=seconds)
+        elif clock in values:
+            # the increment comes back after the move, so most of it can be spent now
+            remaining = values[clock] / 1000 + 0.8 * values.get(inc, 0) / 1000
+            limits = SearchLimits.for_clock(remaining, pos.fullmove, depth)
+        else:
+            limits = SearchLimits(depth=depth)
+        limits.nodes = values.get('nodes')
+        return limits
+
+    def release_bestmove(self):
+        """Let the current go report its bestmove: now if it is held, else when it ends."""
+        with self._go_lock:
+            go = self._go
+            if go is None:
+                return
+            go.wait = False
+            line, go.bestmove = go.bestmove, None
+        if line is not None:
+            self.send(line)
+
+    def go(self, args):
+        pos = self.position.copy()
+        side = pos.side
+        go = _Go(wait='infinite' in args or 'ponder' in args)
+        with self._go_lock:
+            self._go = go
+
+        def on_info(info):
+            self.send(f"info depth {info['depth']} score {uci_score(info['score'], side)} "
+                      f"nodes {info['nodes']} nps {info['nps']} time {info['time_ms']} "
+                      f"pv {' '.join(info['pv'])}")
+
+        def on_done(future):
+            move = None
+            if not future.cancelled():
+                _, move, _ = future.result()
+            if move is None:
+                # stopped before the first iteration finished: any legal move will do
+                legal = pos.legal_moves(side)
+                move = legal[0] if legal else None
+            line = f"bestmove {pos.move_to_uci(move) if move is not None else '0000'}"
+            with self._go_lock:
+                if go.wait:
+                    go.bestmove = line  # sent by release_bestmove()
+                    return
+            self.send(line)
+
+        future = self._engine().search(pos, self.limits(args), on_info=on_info)
+        future.add_done_callback(on_done)
+
+
+def main(tt_mb=16, workers=1, tablebase_dir=None, stdin=sys.stdin, stdout=sys.stdout):
+    session = UCI(stdout, tt_mb=tt_mb, workers=workers, tablebase_dir=tablebase_dir)
+    try:
+        for line in stdin:
+            if not session.handle(line):
+                break
+    finally:
+        session.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())